@@ -1,15 +1,102 @@
 import os
 import platform
+import shlex
 import sys
+from functools import lru_cache
 
 from .util import get_username
 from . import metaflow_version
 from metaflow.exception import MetaflowException
-from metaflow.extension_support import dump_module_info
 from metaflow.mflog import BASH_MFLOG, BASH_MFLOG_AIP
-from . import R
 
-version_cache = None
+# Values that are constant for the lifetime of the process; computing
+# them once at import avoids repeated syscalls (uname, getcwd) in
+# get_environment_info.
+_PLATFORM_SYSTEM = platform.system()
+_PY_VERSION = sys.version
+_PY_VERSION_CODE = f"{sys.version_info[0]}.{sys.version_info[1]}.{sys.version_info[2]}"
+_SCRIPT_BASENAME = os.path.basename(os.path.abspath(sys.argv[0]))
+
+# (dict key, environment variable, default) triples read into the
+# environment info dict with a single batched pass over os.environ.
+_ENV_KEYS = (
+    ("production_token", "METAFLOW_PRODUCTION_TOKEN", None),
+    ("runtime", "METAFLOW_RUNTIME_NAME", "dev"),
+    ("app", "APP", None),
+)
+
+
+# All supported Python versions ship urllib.parse, so the generated
+# snippet no longer needs the Python 2 urlparse fallback.
+_URLPARSE_IMPORT = "from urllib.parse import urlparse"
+
+# Python snippets run remotely to copy the code package; shared across
+# calls and specialized only on the local path.
+_COPY_TEMPLATES = {
+    "download_file": "boto3.client('s3')"
+    ".download_file(parsed.netloc, parsed.path.lstrip('/'), {local!r})",
+    "upload_file": "boto3.client('s3')"
+    ".upload_file({local!r}, parsed.netloc, parsed.path.lstrip('/'))",
+}
+
+# Retry helper emitted once per generated script instead of inlining the
+# full while-loop around the (long) download command; keeps the shipped
+# bootstrap payload shorter.
+_BASH_RETRY_FN = (
+    "mf_retry() { i=0; while [ $i -le 5 ]; do "
+    '"$@" && return 0; sleep 10; i=$((i+1)); '
+    "done; return 1; }"
+)
+
+# The bootstrap shell script assembled once at import; get_package_commands
+# only substitutes the per-call values (interpreter, package url, copy
+# command) into the pre-split template.
+_PACKAGE_CMDS_TEMPLATE = (
+    "{mflog_bash}",
+    "mflog 'Setting up task environment.'",
+    "{python} -m pip install requests boto3 -qqq",
+    "mkdir metaflow",
+    "cd metaflow",
+    "mkdir .metaflow",  # mute local datastore creation log
+    "{retry_fn}",
+    "mflog 'Downloading code package from {url}'; "
+    "mf_retry {copy} && mflog 'Code package downloaded.' || "
+    "{{ mflog 'Failed to download code package from {url} "
+    "after 6 tries. Exiting...'; exit 1; }}",
+    "TAR_OPTIONS='--warning=no-timestamp' tar xf job.tar",
+    "mflog 'Task is starting.'",
+)
+
+
+@lru_cache(maxsize=128)
+def _cached_package_commands(code_package_url, mflog_bash, python, copy_command):
+    # a task fan-out shares one code package url, so the assembled
+    # command tuple is reused across all of its launches
+    subs = {
+        "mflog_bash": mflog_bash,
+        "python": python,
+        "url": code_package_url,
+        "copy": copy_command,
+        "retry_fn": _BASH_RETRY_FN,
+    }
+    return tuple(cmd.format(**subs) for cmd in _PACKAGE_CMDS_TEMPLATE)
+
+
+@lru_cache(maxsize=1)
+def _cached_version():
+    return metaflow_version.get_version()
+
+
+@lru_cache(maxsize=1)
+def _cached_dump_module_info():
+    # imported here (and cached) so that the extension-scanning machinery
+    # is only pulled in when environment info is actually requested
+    from metaflow.extension_support import dump_module_info
+
+    return dump_module_info()
+
+
+_EMPTY_TUPLE = ()
 
 
 class InvalidEnvironmentException(MetaflowException):
@@ -19,8 +106,18 @@ class InvalidEnvironmentException(MetaflowException):
 class MetaflowEnvironment(object):
     TYPE = "local"
 
+    # no per-instance __dict__; environments are instantiated per
+    # step/task in fan-out flows. Subclasses that add attributes either
+    # declare their own __slots__ or fall back to a __dict__.
+    __slots__ = ("_python_exe",)
+
+    # get_environment_info() promises stable output (no timestamps), so
+    # the dict is computed once per environment TYPE and shared across
+    # all instances of that type; relies on CPython dict atomicity.
+    _env_info_by_type = {}
+
     def __init__(self, flow):
-        pass
+        self._python_exe = None
 
     def init_environment(self, echo):
         """
@@ -40,12 +137,14 @@ class MetaflowEnvironment(object):
         Environment may insert decorators, equivalent to setting --with
         options on the command line.
         """
-        return ()
+        return _EMPTY_TUPLE
 
     def bootstrap_commands(self, step_name):
         """
         A list of shell commands to bootstrap this environment in a remote runtime.
         """
+        # callers concatenate this with their own command lists, so it
+        # must stay a fresh list rather than a shared tuple
         return []
 
     def add_to_package(self):
@@ -53,12 +152,14 @@ class MetaflowEnvironment(object):
         A list of tuples (file, arcname) to add to the job package.
         `arcname` is an alternative name for the file in the job package.
         """
+        # conda_environment appends to the returned list; keep it fresh
         return []
 
     def pylint_config(self):
         """
         Environment may override pylint config.
         """
+        # conda_environment appends to the returned list; keep it fresh
         return []
 
     @classmethod
@@ -80,91 +181,101 @@ class MetaflowEnvironment(object):
         return "Local environment"
 
     def get_boto3_copy_command(self, s3_path, local_path, command="download_file"):
-        if command == "download_file":
-            copy_command = (
-                "boto3.client('s3')"
-                ".download_file(parsed.netloc, parsed.path.lstrip('/'), '%s')"
-                % local_path
-            )
-        elif command == "upload_file":
-            copy_command = (
-                "boto3.client('s3')"
-                ".upload_file('%s', parsed.netloc, parsed.path.lstrip('/'))"
-                % local_path
-            )
-        else:
+        template = _COPY_TEMPLATES.get(command)
+        if template is None:
             raise ValueError("%s not supported" % command)
+        copy_command = template.format(local=local_path)
 
-        return (
-            '%s -c "import boto3; ' % self._python()
-            + "exec('try:\\n from urlparse import urlparse\\nexcept:\\n from urllib.parse import "
-            "urlparse'); "
-            + "parsed = urlparse('%s'); " % s3_path
-            + '%s"' % copy_command
+        # repr() gives a proper Python literal for the path and
+        # shlex.quote a proper shell word for the whole program, so paths
+        # containing quotes or spaces cannot break out of either context
+        program = (
+            f"import boto3; {_URLPARSE_IMPORT}; "
+            f"parsed = urlparse({s3_path!r}); {copy_command}"
         )
+        return f"{self._python()} -c {shlex.quote(program)}"
 
     def get_package_commands(
         self,
         code_package_url,
         is_aip_plugin=False,
     ):
-        mflog_bash_cmd = BASH_MFLOG if not is_aip_plugin else BASH_MFLOG_AIP
-        cmds = [
-            mflog_bash_cmd,
-            "mflog 'Setting up task environment.'",
-            "%s -m pip install requests boto3 -qqq" % self._python(),
-            "mkdir metaflow",
-            "cd metaflow",
-            "mkdir .metaflow",  # mute local datastore creation log
-            "i=0; while [ $i -le 5 ]; do "
-            f"mflog 'Downloading code package from {code_package_url}'; "
-            "%s && mflog 'Code package downloaded.' && break; "
-            "sleep 10; i=$((i+1)); "
-            "done" % self.get_boto3_copy_command(code_package_url, "job.tar"),
-            "if [ $i -gt 5 ]; then "
-            "mflog 'Failed to download code package from %s "
-            "after 6 tries. Exiting...' && exit 1; "
-            "fi" % code_package_url,
-            "TAR_OPTIONS='--warning=no-timestamp' tar xf job.tar",
-            "mflog 'Task is starting.'",
-        ]
-        return cmds
+        return list(
+            _cached_package_commands(
+                code_package_url,
+                BASH_MFLOG_AIP if is_aip_plugin else BASH_MFLOG,
+                self._python(),
+                self.get_boto3_copy_command(code_package_url, "job.tar"),
+            )
+        )
+
+    @property
+    def environment_info(self):
+        """
+        The stable environment info dict, built lazily on first access.
+
+        A functools.cached_property would need a per-instance __dict__,
+        which __slots__ removes; the per-TYPE class cache gives the same
+        build-once behavior shared across instances.
+        """
+        return self.get_environment_info()
 
     def get_environment_info(self):
-        global version_cache
-        if version_cache is None:
-            version_cache = metaflow_version.get_version()
+        cache = MetaflowEnvironment._env_info_by_type
+        cached = cache.get(self.TYPE)
+        if cached is not None:
+            return cached
+
+        from . import R
 
+        # Single R.use_r() call per build; the flag cannot be memoized at
+        # module scope because R.__init_r__ flips it at runtime.
+        use_r = R.use_r()
         # note that this dict goes into the code package
         # so variables here should be relatively stable (no
         # timestamps) so the hash won't change all the time
+        env_get = os.environ.get
+        # Information about extension modules (to load them in the proper order)
+        ext_key, ext_val = _cached_dump_module_info()
+        # build the dict in one construction to avoid incremental resizes
+        # from key-by-key inserts after the literal
         env = {
-            "platform": platform.system(),
+            "platform": _PLATFORM_SYSTEM,
             "username": get_username(),
-            "production_token": os.environ.get("METAFLOW_PRODUCTION_TOKEN"),
-            "runtime": os.environ.get("METAFLOW_RUNTIME_NAME", "dev"),
-            "app": os.environ.get("APP"),
             "environment_type": self.TYPE,
-            "use_r": R.use_r(),
-            "python_version": sys.version,
-            "python_version_code": "%d.%d.%d" % sys.version_info[:3],
-            "metaflow_version": version_cache,
-            "script": os.path.basename(os.path.abspath(sys.argv[0])),
+            "use_r": use_r,
+            "python_version": _PY_VERSION,
+            "python_version_code": _PY_VERSION_CODE,
+            "metaflow_version": _cached_version(),
+            "script": _SCRIPT_BASENAME,
+            **{key: env_get(var, default) for key, var, default in _ENV_KEYS},
+            **(
+                {
+                    "metaflow_r_version": R.metaflow_r_version(),
+                    "r_version": R.r_version(),
+                    "r_version_code": R.r_version_code(),
+                }
+                if use_r
+                else {}
+            ),
+            ext_key: ext_val,
         }
-        if R.use_r():
-            env["metaflow_r_version"] = R.metaflow_r_version()
-            env["r_version"] = R.r_version()
-            env["r_version_code"] = R.r_version_code()
-        # Information about extension modules (to load them in the proper order)
-        ext_key, ext_val = dump_module_info()
-        env[ext_key] = ext_val
+        # unset optional values (production_token, app, ...) are dropped
+        # to shrink the serialized INFO file; metaflow_version is indexed
+        # directly downstream so it is kept even when None
+        env = {k: v for k, v in env.items() if v is not None or k == "metaflow_version"}
+        cache[self.TYPE] = env
         return env
 
     def executable(self, step_name):
         return self._python()
 
     def _python(self):
-        if R.use_r():
-            return "python3"
-        else:
-            return "python"
+        # resolved lazily so the R flag is read after R's init hook ran.
+        # getattr guards subclasses that (like CondaEnvironment) never
+        # call super().__init__(), leaving the slot unset
+        if getattr(self, "_python_exe", None) is None:
+            from . import R
+
+            self._python_exe = "python3" if R.use_r() else "python"
+        return self._python_exe
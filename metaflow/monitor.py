@@ -38,7 +38,8 @@ class Monitor(NullMonitor):
         # type: (str) -> None
         self.sidecar_process = None
         self.monitor_type = monitor_type
-        self.env_info = env.get_environment_info()
+        # copy: get_environment_info() returns a shared cached dict
+        self.env_info = dict(env.get_environment_info())
         self.env_info["flow_name"] = flow_name
 
     def start(self):
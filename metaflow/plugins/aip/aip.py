@@ -5,12 +5,23 @@ import marshal
 import numbers
 import os
 import re
+import shlex
 import sys
+import zlib
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Text, Tuple, Union
+from string import Template
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Text, Tuple, Union
 import yaml
 
+try:
+    # the libyaml C emitter is several times faster than the pure-Python
+    # one for the large compiled workflow documents
+    from yaml import CSafeDumper as _YamlSafeDumper
+except ImportError:
+    from yaml import SafeDumper as _YamlSafeDumper
+
 import kfp
 from kfp import dsl
 from kfp.dsl import ContainerOp, PipelineConf, PipelineVolume, ResourceOp
@@ -51,6 +62,7 @@ from metaflow.metaflow_config import (
 from metaflow.plugins import EnvironmentDecorator, AIPInternalDecorator
 from metaflow.plugins.aip.aip_constants import (
     EXIT_HANDLER_RETRY_COUNT,
+    EXIT_HANDLER_TIMEOUT_SECONDS,
     BACKOFF_DURATION,
     BACKOFF_DURATION_INT,
     RETRY_BACKOFF_FACTOR,
@@ -72,6 +84,94 @@ UNSUPPORTED_DECORATORS = (
     ScheduleDecorator,
 )
 
+# exact-type variant of UNSUPPORTED_DECORATORS: one hash lookup per
+# decorator instead of an MRO walk; neither decorator is subclassed
+_UNSUPPORTED_DECORATOR_TYPES = frozenset(UNSUPPORTED_DECORATORS)
+
+# resources whose bare-number values default to the megabyte unit
+_MEMORY_RESOURCES = frozenset({"memory", "volume"})
+
+# k8s label-value validation, compiled once instead of per tag
+_TAG_VALUE_RE = re.compile(r"(([A-Za-z0-9][-A-Za-z0-9_.]*)?[A-Za-z0-9])?")
+
+# label/annotation keys assembled once; these are applied per step and
+# per tag, so the per-call f-string formatting added up
+_MF_FLOW_NAME_KEY = "metaflow.org/flow_name"
+_MF_EXPERIMENT_KEY = "metaflow.org/experiment"
+_MF_TAG_PREFIX = "metaflow.org/tag_"
+_MF_STEP_KEY = "metaflow.org/step"
+_MF_RUN_ID_KEY = "metaflow.org/run_id"
+_ZODIAC_OWNER_KEY = "zodiac.zillowgroup.net/owner"
+_ZODIAC_SERVICE_KEY = "zodiac.zillowgroup.net/service"
+_ZODIAC_TEAM_KEY = "zodiac.zillowgroup.net/team"
+_ZODIAC_PRODUCT_KEY = "zodiac.zillowgroup.net/product"
+
+# static tolerations shared across steps; the kubernetes models are
+# read-only during serialization, so one instance per shape suffices.
+# NOTE: the `effect` parameter must be specified at the top, otherwise
+# there is undefined behavior.
+_SPOT_TOLERATION = V1Toleration(
+    effect="NoSchedule",
+    key="node.k8s.zgtools.net/capacity-type",
+    operator="Equal",
+    value="spot",
+)
+_HIGH_MEMORY_TOLERATION = V1Toleration(
+    effect="NoSchedule",
+    key="node.k8s.zgtools.net/purpose",
+    operator="Equal",
+    value="high-memory",
+)
+# accelerator tolerations differ only by accelerator type
+_ACCELERATOR_TOLERATIONS: Dict[str, V1Toleration] = {}
+
+# shared-memory emptyDir sources keyed by size limit; the source is
+# read-only during serialization, so steps with the same size share one
+# kubernetes model object instead of re-validating a fresh one each
+_EMPTY_DIR_SHM_SOURCES: Dict[str, V1EmptyDirVolumeSource] = {}
+
+
+def _build_pod_env_vars() -> List[V1EnvVar]:
+    """
+    The env specs attached to every ContainerOp; identical across all
+    ops and compilations, so the model objects are built once at import.
+    """
+    downward_api_env_vars = {
+        "MF_POD_NAME": "metadata.name",
+        "MF_POD_NAMESPACE": "metadata.namespace",
+        "MF_ARGO_NODE_NAME": "metadata.annotations['workflows.argoproj.io/node-name']",
+        "MF_ARGO_WORKFLOW_NAME": "metadata.labels['workflows.argoproj.io/workflow']",
+        "ZODIAC_SERVICE": "metadata.labels['zodiac.zillowgroup.net/service']",
+        "ZODIAC_TEAM": "metadata.labels['zodiac.zillowgroup.net/team']",
+        "ZODIAC_OWNER": "metadata.labels['zodiac.zillowgroup.net/owner']",
+    }
+    env_vars = [
+        V1EnvVar(
+            name=name,
+            value_from=V1EnvVarSource(
+                field_ref=V1ObjectFieldSelector(field_path=resource)
+            ),
+        )
+        for name, resource in downward_api_env_vars.items()
+    ]
+    # additional env variable for spark to identify if workflow was
+    # launched from a notebook in an individual namespace.
+    env_vars.append(
+        V1EnvVar(name="INDIVIDUAL_NAMESPACE", value=ZILLOW_INDIVIDUAL_NAMESPACE)
+    )
+    # env variable for ServiceAccount for Zillow Spark solution
+    if KUBERNETES_SERVICE_ACCOUNT:
+        env_vars.append(
+            V1EnvVar(
+                name="METAFLOW_KUBERNETES_SERVICE_ACCOUNT",
+                value=KUBERNETES_SERVICE_ACCOUNT,
+            )
+        )
+    return env_vars
+
+
+_POD_ENV_VARS: List[V1EnvVar] = _build_pod_env_vars()
+
 
 @dataclass
 class FlowVariables:
@@ -94,10 +194,165 @@ class StepVariables:
     user_code_retries: int
 
 
+@dataclass
+class NodeDecorators:
+    """Classification of a node's decorators built in a single pass."""
+
+    aip_decorator: Optional[AIPInternalDecorator] = None
+    accelerator_decorator: Optional[AcceleratorDecorator] = None
+    interruptible_decorator: Optional[interruptibleDecorator] = None
+    environment_decorator: Optional[EnvironmentDecorator] = None
+    retry_decorator: Optional[Any] = None
+    user_code_retries: int = 0
+    total_retries: int = 0
+
+
+@dataclass(frozen=True)
+class OpPolicy:
+    """
+    Scheduling and retry policy for the auxiliary (non-step) ops, frozen
+    so the per-kind policies can live as shared module constants.
+    """
+
+    retry_count: int
+    backoff_duration: str
+    backoff_factor: int
+    cpu: str = "0.5"
+    memory: str = "200M"
+    timeout_seconds: Optional[int] = None
+
+
+_S3_SENSOR_POLICY = OpPolicy(
+    retry_count=AIP_S3_SENSOR_RETRY_COUNT,
+    backoff_duration=BACKOFF_DURATION,
+    backoff_factor=RETRY_BACKOFF_FACTOR,
+)
+
+_EXIT_HANDLER_POLICY = OpPolicy(
+    retry_count=EXIT_HANDLER_RETRY_COUNT,
+    backoff_duration=BACKOFF_DURATION,
+    backoff_factor=RETRY_BACKOFF_FACTOR,
+    timeout_seconds=EXIT_HANDLER_TIMEOUT_SECONDS,
+)
+
+
+def _apply_policy(container_op: ContainerOp, policy: OpPolicy) -> ContainerOp:
+    container = container_op.container
+    container.set_cpu_request(policy.cpu)
+    container.set_cpu_limit(policy.cpu)
+    container.set_memory_request(policy.memory)
+    container.set_memory_limit(policy.memory)
+    container_op.set_retry(
+        policy.retry_count,
+        policy="Always",
+        backoff_duration=policy.backoff_duration,
+        backoff_factor=policy.backoff_factor,
+    )
+    if policy.timeout_seconds is not None:
+        container_op.set_timeout(policy.timeout_seconds)
+    return container_op
+
+
+KFP_METADATA_PREFIX = "pipelines.kubeflow.org/"
+
+# a single (V1-mode) compiler serves both compile and write; its only
+# lasting state is the execution mode set at construction
+_KFP_COMPILER = kfp.compiler.Compiler()
+
+try:
+    # optional C-speed encoder for large nested parameter payloads;
+    # output matches the compact stdlib encoding below
+    import orjson
+
+    def _json_dumps_compact(v: Any) -> str:
+        return orjson.dumps(v).decode("utf-8")
+
+    _json_loads = orjson.loads
+
+except ImportError:
+
+    def _json_dumps_compact(v: Any) -> str:
+        return json.dumps(v, separators=(",", ":"))
+
+    _json_loads = json.loads
+
+
+def _conf_env_variables(*keys: str) -> Dict[str, str]:
+    """
+    The set config values among keys, reading each through from_conf
+    exactly once (a comprehension with from_conf in both the condition
+    and the value would read env + config file twice per key).
+    """
+    env_variables: Dict[str, str] = {}
+    for key in keys:
+        value = from_conf(key)
+        if value:
+            env_variables[key] = value
+    return env_variables
+
+
+def _encode_flow_parameters(flow_parameters: Dict) -> List[Dict[str, Any]]:
+    """
+    Argo parameter list for a flow_parameters dict; dict values are JSON
+    encoded (compactly - the values are shipped inside the workflow spec).
+    """
+    _dumps = _json_dumps_compact
+    return [
+        {"name": k, "value": _dumps(v) if type(v) is dict else v}
+        for k, v in flow_parameters.items()
+    ]
+
+
+# the launching script never changes within a process
+_SCRIPT_NAME = os.path.basename(sys.argv[0])
+
 ARGO_WORKFLOW_UID = "{{workflow.uid}}"
 METAFLOW_RUN_ID = f"argo-{ARGO_WORKFLOW_UID}"
 FLOW_PARAMETERS_JSON = "{{workflow.parameters}}"
 
+# Command templates for the non-step ops, assembled once at import.
+# string.Template is used (rather than str.format) because the commands
+# embed literal Argo {{...}} expressions that format-braces would
+# mangle; per-op values are $-substituted and never re-scanned, so a
+# value containing '$' (e.g. package_commands) is inserted verbatim.
+_EXIT_HANDLER_CMD_TEMPLATE = Template(
+    "$package_commands"
+    " && python -m metaflow.plugins.aip.aip_exit_handler"
+    " --flow_name $flow_name"
+    f" --run_id {METAFLOW_RUN_ID}"
+    f" --argo_workflow_uid {ARGO_WORKFLOW_UID}"
+    " --env_variables_json $env_variables_json"
+    " --flow_parameters_json $flow_parameters_json"
+    "  --status {{workflow.status}}"
+    " $flag"
+)
+
+_UDF_EXIT_HANDLER_CMD_TEMPLATE = Template(
+    "$package_commands"
+    " && METAFLOW_USER=aip-user python $script_name --quiet --no-pylint"
+    " aip user-defined-exit-handler"
+    " --flow_name $flow_name"
+    f" --run_id {METAFLOW_RUN_ID}"
+    f" --argo_workflow_uid {ARGO_WORKFLOW_UID}"
+    " --env_variables_json $env_variables_json"
+    " --flow_parameters_json $flow_parameters_json"
+    "  --status {{workflow.status}}"
+    " --metaflow_configs_json $metaflow_configs_json"
+    " --retries {{retries}}"
+)
+
+_S3_SENSOR_CMD_TEMPLATE = Template(
+    "$package_commands"
+    " && python -m metaflow.plugins.aip.aip_s3_sensor"
+    f" --run_id {METAFLOW_RUN_ID}"
+    " --flow_name $flow_name"
+    f" --flow_parameters_json '{FLOW_PARAMETERS_JSON}'"
+    " --path $path"
+    " --path_formatter_code_encoded '$path_formatter_code_encoded'"
+    " --polling_interval_seconds $polling_interval_seconds"
+    " --timeout_seconds $timeout_seconds"
+)
+
 
 class AIPComponent(object):
     def __init__(
@@ -113,6 +368,9 @@ class AIPComponent(object):
         retry_backoff_factor: float,
     ):
         self.step_name = step_name
+        # k8s object names must be lower case alphanumeric or '-', while
+        # step names are python function names; slugified once here
+        self.k8s_safe_step_name = step_name.lower().replace("_", "-")
         self.resource_requirements = resource_requirements
         self.aip_decorator = aip_decorator
         self.accelerator_decorator = accelerator_decorator
@@ -144,6 +402,17 @@ class AIPComponent(object):
         self.preceding_component_outputs: List[str] = bindings(
             "preceding_component_outputs"
         )
+        # shell-ready encoding used in every step command for this
+        # component; encoded once here instead of per compilation
+        self.preceding_component_outputs_json: str = json.dumps(
+            json.dumps(self.preceding_component_outputs)
+        )
+        # parsed once so toleration decisions don't re-parse the
+        # "500m"/"4G" style resource strings on every call
+        self.cpu_number: float = _get_cpu_number(resource_requirements.get("cpu", "0"))
+        self.memory_number: float = _get_resource_number(
+            resource_requirements.get("memory", "0")
+        )
 
 
 class KubeflowPipelines(object):
@@ -173,6 +442,10 @@ class KubeflowPipelines(object):
         notify_on_success=None,
         sqs_url_on_error=None,
         sqs_role_arn_on_error=None,
+        image_pull_policy="IfNotPresent",
+        exit_handler_image=None,
+        enable_lazy_image_pull=False,
+        enable_image_prewarm=False,
         **kwargs,
     ):
         """
@@ -204,17 +477,120 @@ class KubeflowPipelines(object):
         self.notify_on_success = notify_on_success
         self.sqs_url_on_error = sqs_url_on_error
         self.sqs_role_arn_on_error = sqs_role_arn_on_error
+        # IfNotPresent skips the registry round-trip when the (immutable,
+        # digest-tagged) image is already on the node; a per-step
+        # @aip(image_pull_policy=...) overrides this flow-wide default
+        self.image_pull_policy = image_pull_policy
+        # the sqs/notify exit handlers only run aip_exit_handler (stdlib
+        # + boto3), so a slim image pulls much faster than the full step
+        # image; defaults to base_image for back-compat.  The
+        # user-defined handler runs arbitrary flow code and keeps the
+        # full image unless @exit_handler supplies its own.
+        self.exit_handler_image = exit_handler_image or base_image
+        # opt-in: annotate pods for the SOCI snapshotter so image layers
+        # are lazily fetched via range requests instead of a full pull.
+        # Only effective on nodes running the snapshotter and for images
+        # with a SOCI index (`soci create`); a no-op otherwise
+        self.enable_lazy_image_pull = enable_lazy_image_pull
+        # opt-in: start one no-op pod per distinct step image alongside
+        # the DAG root so cold nodes begin pulling all images up front
+        # instead of serially as the DAG reaches each step
+        self.enable_image_prewarm = enable_image_prewarm
         self._client = None
         self._exit_handler_created = False
+        self._task_ids = None
+        self._foreach_step_names = None
+        self._foreach_join_names = None
+        self._node_decorators = None
+        self._node_resource_requirements = None
+        self._flow_labels = None
+        # serialized compiled workflows keyed by their flow parameters
+        self._compiled_workflows: Dict[str, str] = {}
+        # step-command flag runs that are invariant across all steps
+        self._step_cmd_invariants: Optional[Tuple[str, str]] = None
+        # exit-handler env dicts, keyed by handler name; built from
+        # from_conf and instance state, both fixed for this object
+        self._exit_handler_envs: Dict[str, dict] = {}
+        # pipeline-function signatures keyed by their flow parameters
+        self._signatures: Dict[str, inspect.Signature] = {}
+        # resolved once; the decorator list is fixed for this process and
+        # the scan is needed both when building the exit-handler op and
+        # when wiring the onExit dag
+        self._udf_exit_handler: Optional[FlowDecorator] = next(
+            (d for d in flow_decorators() if d.name == "exit_handler"), None
+        )
+
+    @property
+    def flow_labels(self) -> Mapping:
+        # flow name, experiment, tags and username are fixed for the
+        # lifetime of this object, so the labels are computed once; the
+        # read-only view keeps per-op consumers from mutating the shared
+        # dict
+        if self._flow_labels is None:
+            self._flow_labels = MappingProxyType(
+                KubeflowPipelines._get_flow_labels(
+                    self.name, self.experiment, self.tags, self.sys_tags, self.username
+                )
+            )
+        return self._flow_labels
+
+    @property
+    def node_decorators(self) -> Dict[str, NodeDecorators]:
+        # one decorator-classification pass per node per compilation
+        if self._node_decorators is None:
+            self._node_decorators = {
+                name: KubeflowPipelines._index_decorators(node)
+                for name, node in self.graph.nodes.items()
+            }
+        return self._node_decorators
+
+    @property
+    def node_resource_requirements(self) -> Dict[str, Dict[str, str]]:
+        if self._node_resource_requirements is None:
+            self._node_resource_requirements = {
+                name: KubeflowPipelines._get_resource_requirements(node)
+                for name, node in self.graph.nodes.items()
+            }
+        return self._node_resource_requirements
+
+    @property
+    def task_ids(self) -> Dict[str, str]:
+        # the graph does not change during a compilation, so the
+        # (non-trivial) topological walk is done only once
+        if self._task_ids is None:
+            self._task_ids = graph_to_task_ids(self.graph)
+        return self._task_ids
+
+    @property
+    def foreach_join_names(self) -> set:
+        # joins that close a ParallelFor; build_kfp_dag halts on these
+        if self._foreach_join_names is None:
+            graph = self.graph
+            self._foreach_join_names = {
+                node.name
+                for node in graph.nodes.values()
+                if node.type == "join"
+                and graph[node.split_parents[-1]].type == "foreach"
+            }
+        return self._foreach_join_names
+
+    @property
+    def foreach_step_names(self) -> set:
+        if self._foreach_step_names is None:
+            self._foreach_step_names = {
+                node.name for node in self.graph if node.type == "foreach"
+            }
+        return self._foreach_step_names
 
     @classmethod
     def trigger(cls, kubernetes_namespace: str, name: str, parameters=None):
         if parameters is None:
             parameters = {}
+        # one client for both calls - each ArgoClient spins up a new
+        # Kubernetes API client
+        client = ArgoClient(namespace=kubernetes_namespace)
         try:
-            workflow_template = ArgoClient(
-                namespace=kubernetes_namespace
-            ).get_workflow_template(name)
+            workflow_template = client.get_workflow_template(name)
         except Exception as e:
             raise AIPException(str(e))
         if workflow_template is None:
@@ -223,29 +599,44 @@ class KubeflowPipelines(object):
                 "Please deploy your flow first."
             )
         try:
-            return ArgoClient(namespace=kubernetes_namespace).trigger_workflow_template(
-                name, parameters
-            )
+            return client.trigger_workflow_template(name, parameters)
         except Exception as e:
             raise AIPException(str(e))
 
     @staticmethod
-    def _remove_kfp_annotations_labels(workflow: Dict[Text, Any]):
-        def remove_keys(d: dict):
-            kf_prefix = "pipelines.kubeflow.org/"
-            for k in list(d):
-                if k.startswith(kf_prefix):
-                    del d[k]
+    def _post_process_templates(workflow: Dict[Text, Any]) -> Dict[str, dict]:
+        """
+        Single pass over the compiled templates that
+        - prunes the kubeflow annotations and labels,
+        - adds an "archive" none section to "-card" output artifacts
+          (by default they are tarred and hence not viewable in the
+          Argo UI),
+        - indexes the templates by name for later O(1) lookups.
+        """
 
         def remove_annotations_labels(d: dict):
-            remove_keys(d["metadata"]["annotations"])
-            remove_keys(d["metadata"]["labels"])
+            # rebuilding via a comprehension avoids per-key hash-table
+            # deletion and shrink operations
+            metadata = d["metadata"]
+            for section in ("annotations", "labels"):
+                metadata[section] = {
+                    k: v
+                    for k, v in metadata[section].items()
+                    if not k.startswith(KFP_METADATA_PREFIX)
+                }
 
         remove_annotations_labels(workflow)
 
+        templates_by_name: Dict[str, dict] = {}
         for template in workflow["spec"]["templates"]:
+            templates_by_name[template["name"]] = template
             if "metadata" in template:
                 remove_annotations_labels(template)
+            if "outputs" in template and "artifacts" in template["outputs"]:
+                for artifact in template["outputs"]["artifacts"]:
+                    if "-card" in artifact["name"]:
+                        artifact["archive"] = {"none": {}}
+        return templates_by_name
 
     def _create_workflow_yaml(
         self,
@@ -258,21 +649,34 @@ class KubeflowPipelines(object):
         Creates a new Argo Workflow pipeline YAML using `aip.compiler.Compiler()`.
         Note: Intermediate pipeline YAML is saved at `pipeline_file_path`
         """
-        pipeline_func, pipeline_conf = self.create_kfp_pipeline_from_flow_graph(
-            flow_parameters
-        )
-        workflow: Dict[Text, Any] = kfp.compiler.Compiler()._create_workflow(
-            pipeline_func=pipeline_func,
-            pipeline_conf=pipeline_conf,
-        )
+        # the graph is fixed for this object, so the KFP compilation (which
+        # dominates emit time) is done once per distinct parameter set and
+        # reused across kinds (Workflow, WorkflowTemplate, ...).  The cache
+        # holds the serialized form so every call mutates an isolated dict.
+        cache_key = _json_dumps_compact(flow_parameters)
+        cached: Optional[str] = self._compiled_workflows.get(cache_key)
+        if cached is None:
+            pipeline_func, pipeline_conf = self.create_kfp_pipeline_from_flow_graph(
+                flow_parameters
+            )
+            workflow: Dict[Text, Any] = _KFP_COMPILER._create_workflow(
+                pipeline_func=pipeline_func,
+                pipeline_conf=pipeline_conf,
+            )
 
-        # mutates and removes kubeflow labels and annotations
-        KubeflowPipelines._remove_kfp_annotations_labels(workflow)
+            # mutates the workflow: removes kubeflow labels and annotations,
+            # un-archives card artifacts, and indexes templates by name
+            templates_by_name: Dict[
+                str, dict
+            ] = KubeflowPipelines._post_process_templates(workflow)
+            self._compiled_workflows[cache_key] = _json_dumps_compact(workflow)
+        else:
+            workflow = _json_loads(cached)
+            templates_by_name = {t["name"]: t for t in workflow["spec"]["templates"]}
 
-        workflow["spec"]["arguments"]["parameters"] = [
-            dict(name=k, value=json.dumps(v) if isinstance(v, dict) else v)
-            for k, v in flow_parameters.items()
-        ]
+        workflow["spec"]["arguments"]["parameters"] = _encode_flow_parameters(
+            flow_parameters
+        )
 
         if kind == "Workflow":
             # Output of KFP compiler already has workflow["kind"] = "Workflow".
@@ -313,12 +717,7 @@ class KubeflowPipelines(object):
             }
 
         # add Flow labels as Workflow labels to be searchable in the Argo UI
-        for key, value in KubeflowPipelines._get_flow_labels(
-            self.name, self.experiment, self.tags, self.sys_tags, self.username
-        ).items():
-            workflow["metadata"]["labels"][key] = value
-
-        KubeflowPipelines._add_archive_section_to_cards_artifacts(workflow)
+        workflow["metadata"]["labels"].update(self.flow_labels)
 
         if self._exit_handler_created:
             # replace entrypoint content with the exit handler handler content
@@ -354,20 +753,23 @@ class KubeflowPipelines(object):
                   - {name: sqs-exit-handler, template: sqs-exit-handler}
                   - {name: user-defined-exit-handler, template: user-defined-exit-handler}
             """
-            # find the entrypoint template
-            entrypoint_template: dict = [
-                template
-                for template in workflow["spec"]["templates"]
-                if template["name"] == workflow["spec"]["entrypoint"]
-            ][0]
-
-            # remove exit handlers from the entrypoint template
-            entrypoint_template["dag"]["tasks"] = [
-                task
-                for task in entrypoint_template["dag"]["tasks"]
-                if "exit-handler" not in task["name"]
+            # the entrypoint template was indexed during post-processing
+            entrypoint_template: dict = templates_by_name[
+                workflow["spec"]["entrypoint"]
             ]
 
+            # remove exit handlers from the entrypoint template, in place
+            # to avoid rebuilding the (potentially long) task list when
+            # there is nothing to drop
+            entrypoint_tasks = entrypoint_template["dag"]["tasks"]
+            to_drop = [
+                i
+                for i, task in enumerate(entrypoint_tasks)
+                if "exit-handler" in task["name"]
+            ]
+            for i in reversed(to_drop):
+                del entrypoint_tasks[i]
+
             # initialize the exit-handler template
             exit_handler_template: dict = {"name": "exit-handler", "dag": {"tasks": []}}
             workflow["spec"]["templates"].append(exit_handler_template)
@@ -397,9 +799,7 @@ class KubeflowPipelines(object):
 
                 exit_handler_template["dag"]["tasks"].append(notify_task)
 
-            udf_handler: Optional[FlowDecorator] = next(
-                (d for d in flow_decorators() if d.name == "exit_handler"), None
-            )
+            udf_handler: Optional[FlowDecorator] = self._udf_exit_handler
             if udf_handler:
                 udf_task = {
                     "name": "user-defined-exit-handler",
@@ -422,16 +822,6 @@ class KubeflowPipelines(object):
 
         return workflow
 
-    @staticmethod
-    def _add_archive_section_to_cards_artifacts(workflow: dict):
-        # Add "archive" none section to "-cards" artifacts because by default
-        # they are tarred and hence not viewable in the Argo UI
-        for template in workflow["spec"]["templates"]:
-            if "outputs" in template and "artifacts" in template["outputs"]:
-                for artifact in template["outputs"]["artifacts"]:
-                    if "-card" in artifact["name"]:
-                        artifact["archive"] = {"none": {}}
-
     @staticmethod
     def _config_map(workflow_name: str, max_run_concurrency: int):
         if not max_run_concurrency or max_run_concurrency <= 0:
@@ -453,7 +843,9 @@ class KubeflowPipelines(object):
         concurrency: Optional[str] = None,
         recurring_run_enable: Optional[bool] = False,
     ) -> Dict[str, Any]:
-        body = {
+        # built in one expression - the shape is fixed, only the values
+        # (and the optional arguments section) vary per call
+        return {
             "apiVersion": "argoproj.io/v1alpha1",
             "kind": "CronWorkflow",
             "metadata": {"name": name},
@@ -463,20 +855,21 @@ class KubeflowPipelines(object):
                     schedule if schedule else "* * 0 * *"
                 ),  # Day of month: 0 (invalid day) will never run
                 "concurrencyPolicy": concurrency,
-                "workflowSpec": {"workflowTemplateRef": {"name": name}},
+                "workflowSpec": {
+                    "workflowTemplateRef": {"name": name},
+                    **(
+                        {
+                            "arguments": {
+                                "parameters": _encode_flow_parameters(flow_parameters)
+                            }
+                        }
+                        if flow_parameters
+                        else {}
+                    ),
+                },
             },
         }
 
-        if flow_parameters:
-            body["spec"]["workflowSpec"]["arguments"] = {
-                "parameters": [
-                    dict(name=k, value=json.dumps(v) if isinstance(v, dict) else v)
-                    for k, v in flow_parameters.items()
-                ]
-            }
-
-        return body
-
     def run_workflow_on_argo(
         self,
         kubernetes_namespace: str,
@@ -495,16 +888,13 @@ class KubeflowPipelines(object):
             argo_workflow_name, max_run_concurrency
         )
 
+        client = ArgoClient(namespace=kubernetes_namespace)
         try:
             # Create the Argo synchronization ConfigMap
-            config = ArgoClient(
-                namespace=kubernetes_namespace
-            ).create_workflow_config_map(argo_workflow_name, config_map)
+            config = client.create_workflow_config_map(argo_workflow_name, config_map)
 
             # Create/Run the Argo Workflow
-            running_workflow = ArgoClient(namespace=kubernetes_namespace).run_workflow(
-                workflow
-            )
+            running_workflow = client.run_workflow(workflow)
             return running_workflow, config
         except Exception as e:
             raise AIPException(str(e))
@@ -528,7 +918,19 @@ class KubeflowPipelines(object):
                 max_run_concurrency,
                 sanitized_name,
             )
-            kfp.compiler.Compiler()._write_workflow(workflow, output_path)
+            if output_path.endswith((".yaml", ".yml")):
+                # bypass kfp's pure-Python ordered dumper for plain yaml
+                # outputs; archive outputs (.tar.gz/.zip) still go
+                # through the kfp writer
+                with open(output_path, "w") as yaml_file:
+                    yaml.dump(
+                        workflow,
+                        yaml_file,
+                        Dumper=_YamlSafeDumper,
+                        default_flow_style=False,
+                    )
+            else:
+                _KFP_COMPILER._write_workflow(workflow, output_path)
         elif kind == "CronWorkflow":
             cron_workflow: Dict[str, Any] = KubeflowPipelines._cron_workflow(
                 sanitized_name,
@@ -538,13 +940,23 @@ class KubeflowPipelines(object):
                 recurring_run_enable=recurring_run_enable,
             )
             with open(output_path, "w") as yaml_file:
-                yaml.safe_dump(cron_workflow, yaml_file, default_flow_style=False)
+                yaml.dump(
+                    cron_workflow,
+                    yaml_file,
+                    Dumper=_YamlSafeDumper,
+                    default_flow_style=False,
+                )
         elif kind == "ConfigMap":
             config_map = KubeflowPipelines._config_map(
                 sanitized_name, max_run_concurrency
             )
             with open(output_path, "w") as yaml_file:
-                yaml.safe_dump(config_map, yaml_file, default_flow_style=False)
+                yaml.dump(
+                    config_map,
+                    yaml_file,
+                    Dumper=_YamlSafeDumper,
+                    default_flow_style=False,
+                )
         else:
             raise NotImplementedError(f"Unsupported output format {kind}.")
 
@@ -567,10 +979,9 @@ class KubeflowPipelines(object):
         return max_user_code_retries, max_user_code_retries + max_error_retries
 
     @staticmethod
-    def _get_minutes_between_retries(node: DAGNode) -> Optional[str]:
-        retry_deco = [deco for deco in node.decorators if deco.name == "retry"]
+    def _get_minutes_between_retries(retry_deco: Optional[Any]) -> Optional[str]:
         if retry_deco:
-            val = retry_deco[0].attributes.get("minutes_between_retries")
+            val = retry_deco.attributes.get("minutes_between_retries")
             is_number = isinstance(val, numbers.Number) or (
                 isinstance(val, str) and val.isdecimal()
             )
@@ -578,19 +989,59 @@ class KubeflowPipelines(object):
         return None
 
     @staticmethod
-    def _get_retry_backoff_factor(node: DAGNode) -> Optional[float]:
-        retry_deco = [deco for deco in node.decorators if deco.name == "retry"]
+    def _get_retry_backoff_factor(retry_deco: Optional[Any]) -> Optional[float]:
         if retry_deco:
-            val = retry_deco[0].attributes.get("retry_backoff_factor")
+            val = retry_deco.attributes.get("retry_backoff_factor")
             return int(val)
         return None
 
+    @staticmethod
+    def _index_decorators(node: DAGNode) -> NodeDecorators:
+        """
+        Classify all of a node's decorators in one pass instead of
+        scanning node.decorators once per decorator kind.
+        """
+        index = NodeDecorators()
+        max_user_code_retries = 0
+        max_error_retries = 0
+        for deco in node.decorators:
+            if type(deco) in _UNSUPPORTED_DECORATOR_TYPES:
+                raise AIPException(
+                    f"{type(deco)} in {node.name} step is not yet supported by aip"
+                )
+            if index.aip_decorator is None and isinstance(deco, AIPInternalDecorator):
+                index.aip_decorator = deco
+            elif index.accelerator_decorator is None and isinstance(
+                deco, AcceleratorDecorator
+            ):
+                index.accelerator_decorator = deco
+            elif index.interruptible_decorator is None and isinstance(
+                deco, interruptibleDecorator
+            ):
+                index.interruptible_decorator = deco
+            elif index.environment_decorator is None and isinstance(
+                deco, EnvironmentDecorator
+            ):
+                index.environment_decorator = deco
+            if index.retry_decorator is None and deco.name == "retry":
+                index.retry_decorator = deco
+
+            # Different decorators may have different retrying strategies,
+            # so take the max of them.
+            user_code_retries, error_retries = deco.step_task_retry_count()
+            max_user_code_retries = max(max_user_code_retries, user_code_retries)
+            max_error_retries = max(max_error_retries, error_retries)
+
+        index.user_code_retries = max_user_code_retries
+        index.total_retries = max_user_code_retries + max_error_retries
+        return index
+
     @staticmethod
     def _to_k8s_resource_format(resource: str, value: Union[int, float, str]) -> str:
-        value = str(value)
+        value = value if type(value) is str else str(value)
 
         # Defaults memory unit to megabyte
-        if resource in ["memory", "volume"] and value.isnumeric():
+        if resource in _MEMORY_RESOURCES and value.isdecimal():
             value = f"{value}M"
         return value
 
@@ -654,6 +1105,9 @@ class KubeflowPipelines(object):
         code_package_url: str,
         environment: MetaflowEnvironment,
     ) -> str:
+        # interned: the same preamble is prefixed onto the command of every
+        # step, sensor and exit-handler op, so all of them (and repeated
+        # compilations) share one string object instead of N copies
         if self.s3_code_package:
             cmd: List[str] = [
                 "mkdir -p /opt/metaflow_volume/metaflow_logs",
@@ -662,9 +1116,11 @@ class KubeflowPipelines(object):
             cmd.extend(
                 environment.get_package_commands(code_package_url, is_aip_plugin=True)
             )
-            return " && ".join(cmd)
+            return sys.intern(" && ".join(cmd))
         else:
-            return " cd " + str(Path(inspect.getabsfile(self.flow.__class__)).parent)
+            return sys.intern(
+                " cd " + str(Path(inspect.getabsfile(self.flow.__class__)).parent)
+            )
 
     def _create_step_variables(self, node: DAGNode) -> StepVariables:
         """
@@ -672,15 +1128,13 @@ class KubeflowPipelines(object):
         used to run Metaflow on KFP "aip_metaflow_step()"
         """
 
-        task_id: str = graph_to_task_ids(self.graph)[node.name]
-        user_code_retries, total_retries = KubeflowPipelines._get_retries(node)
-        resource_requirements: Dict[str, str] = self._get_resource_requirements(node)
+        task_id: str = self.task_ids[node.name]
+        user_code_retries = self.node_decorators[node.name].user_code_retries
+        resource_requirements: Dict[str, str] = self.node_resource_requirements[
+            node.name
+        ]
 
-        is_split_index: bool = (
-            True
-            if any(self.graph[n].type == "foreach" for n in node.in_funcs)
-            else False
-        )
+        is_split_index: bool = not self.foreach_step_names.isdisjoint(node.in_funcs)
         volume_dir: str = (
             ""  # simulating passing None type object to command line
             if "volume_dir" not in resource_requirements
@@ -706,60 +1160,27 @@ class KubeflowPipelines(object):
             """
             Returns the AIPComponent for each step.
             """
-
-            for deco in node.decorators:
-                if isinstance(deco, UNSUPPORTED_DECORATORS):
-                    raise AIPException(
-                        f"{type(deco)} in {node.name} step is not yet supported by aip"
-                    )
-
-            user_code_retries, total_retries = KubeflowPipelines._get_retries(node)
-            resource_requirements = self._get_resource_requirements(node)
-            minutes_between_retries = self._get_minutes_between_retries(node)
-            retry_backoff_factor = self._get_retry_backoff_factor(node)
+            decorators: NodeDecorators = self.node_decorators[node.name]
+            resource_requirements = self.node_resource_requirements[node.name]
 
             return AIPComponent(
                 step_name=node.name,
                 resource_requirements=resource_requirements,
-                aip_decorator=next(
-                    (
-                        deco
-                        for deco in node.decorators
-                        if isinstance(deco, AIPInternalDecorator)
-                    ),
-                    None,  # default
-                ),
-                accelerator_decorator=next(
-                    (
-                        deco
-                        for deco in node.decorators
-                        if isinstance(deco, AcceleratorDecorator)
-                    ),
-                    None,  # default
-                ),
-                interruptible_decorator=next(
-                    (
-                        deco
-                        for deco in node.decorators
-                        if isinstance(deco, interruptibleDecorator)
-                    ),
-                    None,  # default
+                aip_decorator=decorators.aip_decorator,
+                accelerator_decorator=decorators.accelerator_decorator,
+                interruptible_decorator=decorators.interruptible_decorator,
+                environment_decorator=decorators.environment_decorator,
+                total_retries=decorators.total_retries,
+                minutes_between_retries=self._get_minutes_between_retries(
+                    decorators.retry_decorator
                 ),
-                environment_decorator=next(
-                    (
-                        deco
-                        for deco in node.decorators
-                        if isinstance(deco, EnvironmentDecorator)
-                    ),
-                    None,  # default
+                retry_backoff_factor=self._get_retry_backoff_factor(
+                    decorators.retry_decorator
                 ),
-                total_retries=total_retries,
-                minutes_between_retries=minutes_between_retries,
-                retry_backoff_factor=retry_backoff_factor,
             )
 
         # Mapping of steps to their AIPComponent
-        task_ids: Dict[str, str] = graph_to_task_ids(self.graph)
+        task_ids: Dict[str, str] = self.task_ids
         step_name_to_aip_component: Dict[str, AIPComponent] = {}
         for step_name, task_id in task_ids.items():
             node = self.graph[step_name]
@@ -807,12 +1228,7 @@ class KubeflowPipelines(object):
         cpu_threshold = 8  # vCPU
 
         if memory >= memory_threshold or cpu >= cpu_threshold:
-            return V1Toleration(
-                effect="NoSchedule",
-                key="node.k8s.zgtools.net/purpose",
-                operator="Equal",
-                value="high-memory",
-            )
+            return _HIGH_MEMORY_TOLERATION
         else:
             return None
 
@@ -841,31 +1257,38 @@ class KubeflowPipelines(object):
         container_op: ContainerOp, aip_component: AIPComponent
     ):
         resource_requirements: Dict[str, Any] = aip_component.resource_requirements
-        if "memory" in resource_requirements:
-            container_op.container.set_memory_request(resource_requirements["memory"])
-            container_op.container.set_memory_limit(resource_requirements["memory"])
-        if "cpu" in resource_requirements:
-            container_op.container.set_cpu_request(resource_requirements["cpu"])
-            container_op.container.set_cpu_limit(resource_requirements["cpu"])
-        if "gpu" in resource_requirements:
+        # one .get per key instead of an `in` probe plus indexing; the
+        # stored values are non-empty strings, so truthiness is
+        # equivalent to presence
+        memory = resource_requirements.get("memory")
+        cpu = resource_requirements.get("cpu")
+        gpu = resource_requirements.get("gpu")
+        shared_memory = resource_requirements.get("shared_memory")
+        if memory:
+            container_op.container.set_memory_request(memory)
+            container_op.container.set_memory_limit(memory)
+        if cpu:
+            container_op.container.set_cpu_request(cpu)
+            container_op.container.set_cpu_limit(cpu)
+        if gpu:
             # TODO(yunw)(AIP-2048): Support mixture of GPU from different vendors.
             gpu_vendor = resource_requirements.get("gpu_vendor", None)
             container_op.container.set_gpu_limit(
-                resource_requirements["gpu"],
+                gpu,
                 vendor=gpu_vendor if gpu_vendor else "nvidia",
             )
 
-        if "shared_memory" in resource_requirements:
+        if shared_memory:
+            size_limit = shared_memory
+            empty_dir_source = _EMPTY_DIR_SHM_SOURCES.get(size_limit)
+            if empty_dir_source is None:
+                empty_dir_source = _EMPTY_DIR_SHM_SOURCES[
+                    size_limit
+                ] = V1EmptyDirVolumeSource(medium="Memory", size_limit=size_limit)
             memory_volume = PipelineVolume(
                 volume=V1Volume(
-                    # k8s volume name must consist of lower case alphanumeric characters or '-',
-                    # and must start and end with an alphanumeric character,
-                    # but step name is python function name that tends to be alphanumeric chars with '_'
-                    name=f"{aip_component.step_name.lower().replace('_', '-')}-shm",
-                    empty_dir=V1EmptyDirVolumeSource(
-                        medium="Memory",
-                        size_limit=resource_requirements["shared_memory"],
-                    ),
+                    name=f"{aip_component.k8s_safe_step_name}-shm",
+                    empty_dir=empty_dir_source,
                 )
             )
             container_op.add_pvolumes({"dev/shm": memory_volume})
@@ -888,21 +1311,23 @@ class KubeflowPipelines(object):
                 )
                 # ensures the pod created has the correct toleration corresponding to the taint
                 # on the accelerator node for it to be scheduled on that node
-                toleration = V1Toleration(
-                    # the `effect` parameter must be specified at the top!
-                    # otherwise, there is undefined behavior
-                    effect="NoSchedule",
-                    key="k8s.amazonaws.com/accelerator",
-                    operator="Equal",
-                    value=accelerator_type,
-                )
+                toleration = _ACCELERATOR_TOLERATIONS.get(accelerator_type)
+                if toleration is None:
+                    toleration = _ACCELERATOR_TOLERATIONS[
+                        accelerator_type
+                    ] = V1Toleration(
+                        effect="NoSchedule",
+                        key="k8s.amazonaws.com/accelerator",
+                        operator="Equal",
+                        value=accelerator_type,
+                    )
                 container_op.add_toleration(toleration)
 
-        elif "gpu" not in resource_requirements:
+        elif not gpu:
             # Memory and cpu value already validated by set_memory_request and set_cpu_request
             toleration = KubeflowPipelines._create_resource_based_node_type_toleration(
-                cpu=_get_cpu_number(resource_requirements.get("cpu", "0")),
-                memory=_get_resource_number(resource_requirements.get("memory", "0")),
+                cpu=aip_component.cpu_number,
+                memory=aip_component.memory_number,
             )
             if toleration:
                 container_op.add_toleration(toleration)
@@ -918,16 +1343,8 @@ class KubeflowPipelines(object):
 
             # ensures the pod created has the correct toleration corresponding to the taint
             # on the spot node for it to be scheduled on that node
-            toleration = V1Toleration(
-                # the `effect` parameter must be specified at the top!
-                # otherwise, there is undefined behavior
-                effect="NoSchedule",
-                key="node.k8s.zgtools.net/capacity-type",
-                operator="Equal",
-                value="spot",
-            )
             # container_op.add_affinity(affinity)
-            container_op.add_toleration(toleration)
+            container_op.add_toleration(_SPOT_TOLERATION)
 
         if len(affinity_match_expressions) > 0:
             node_selector = V1NodeSelector(
@@ -941,17 +1358,6 @@ class KubeflowPipelines(object):
             affinity = V1Affinity(node_affinity=node_affinity)
             container_op.add_affinity(affinity)
 
-    # used by the s3_sensor_op to tighten resources
-    # to ensure customers don't bear unnecesarily large costs
-    @staticmethod
-    def _set_minimal_container_resources(
-        container_op: ContainerOp, memory: str = "200M"
-    ):
-        container_op.container.set_cpu_request("0.5")
-        container_op.container.set_cpu_limit("0.5")
-        container_op.container.set_memory_request(memory)
-        container_op.container.set_memory_limit(memory)
-
     def _create_volume(
         self,
         step_name: str,
@@ -1016,10 +1422,9 @@ class KubeflowPipelines(object):
         # function return variable
         ret_flow_labels: Dict[str, str] = {}
 
-        prefix = "metaflow.org"
-        ret_flow_labels[f"{prefix}/flow_name"] = flow_name
+        ret_flow_labels[_MF_FLOW_NAME_KEY] = flow_name
         if experiment:
-            ret_flow_labels[f"{prefix}/experiment"] = experiment
+            ret_flow_labels[_MF_EXPERIMENT_KEY] = experiment
 
         all_tags = list()
         all_tags += tags if tags else []
@@ -1027,10 +1432,10 @@ class KubeflowPipelines(object):
         for tag in all_tags:
             if ":" in tag:  # Metaflow commonly uses <name>:<value> as tag format
                 tag_info = tag.split(":", 1)
-                annotation_name = f"{prefix}/tag_{tag_info[0]}"
+                annotation_name = _MF_TAG_PREFIX + tag_info[0]
                 annotation_value = tag_info[1]
             else:
-                annotation_name = f"{prefix}/tag_{tag}"
+                annotation_name = _MF_TAG_PREFIX + tag
                 annotation_value = "true"
 
             if len(annotation_name) > 63:
@@ -1042,77 +1447,74 @@ class KubeflowPipelines(object):
                     f"Tag value {annotation_value} must be no more than 63 characters"
                 )
 
-            pattern = r"(([A-Za-z0-9][-A-Za-z0-9_.]*)?[A-Za-z0-9])?"
-            regex_match = re.fullmatch(pattern, annotation_value)
-            if not regex_match:
-                raise ValueError(
-                    f"Tag {annotation_name} value {annotation_value} must "
-                    "consist of alphanumeric characters, '-', '_' or '.', and "
-                    "must start and end with an alphanumeric character.  Example "
-                    "'MyValue',  or 'my_value',  or '12345', regex used for "
-                    "validation is '(([A-Za-z0-9][-A-Za-z0-9_.]*)?[A-Za-z0-9])?'"
-                )
+            # a purely ascii-alphanumeric value (the common case, e.g.
+            # "true") trivially satisfies the pattern; only values with
+            # '-', '_', '.' or other characters need the regex
+            if not (annotation_value.isascii() and annotation_value.isalnum()):
+                regex_match = _TAG_VALUE_RE.fullmatch(annotation_value)
+                if not regex_match:
+                    raise ValueError(
+                        f"Tag {annotation_name} value {annotation_value} must "
+                        "consist of alphanumeric characters, '-', '_' or '.', and "
+                        "must start and end with an alphanumeric character.  Example "
+                        "'MyValue',  or 'my_value',  or '12345', regex used for "
+                        "validation is '(([A-Za-z0-9][-A-Za-z0-9_.]*)?[A-Za-z0-9])?'"
+                    )
 
             ret_flow_labels[annotation_name] = annotation_value
 
-        zodiac_prefix = "zodiac.zillowgroup.net"
-
         # - In context of Zillow CICD username == "cicd_compile"
         # - In the context of a Zillow NB username == METAFLOW_USER (user_alias)
         # - In the context of Metaflow integration tests username == USER=$GITLAB_USER_EMAIL
         owner = username
         if "@" in owner:
             owner = owner.split("@")[0]
-        ret_flow_labels[f"{zodiac_prefix}/owner"] = owner
+        ret_flow_labels[_ZODIAC_OWNER_KEY] = owner
 
         # If the Zodiac environment variable is present in the notebook (individual profile notebooks only),
         # the Zodiac service and team labels are added to the AIP pods and set. These labels are not added
         # by the AIP webhook to support user-supplied Zodiac service per AIP Notebook. Workflows launched
         # in project CICD profiles will still have these labels added via the AIP webhook.
         if ZILLOW_ZODIAC_SERVICE and ZILLOW_ZODIAC_TEAM:
-            ret_flow_labels[f"{zodiac_prefix}/service"] = ZILLOW_ZODIAC_SERVICE
-            ret_flow_labels[f"{zodiac_prefix}/team"] = ZILLOW_ZODIAC_TEAM
+            ret_flow_labels[_ZODIAC_SERVICE_KEY] = ZILLOW_ZODIAC_SERVICE
+            ret_flow_labels[_ZODIAC_TEAM_KEY] = ZILLOW_ZODIAC_TEAM
 
-        ret_flow_labels[f"{zodiac_prefix}/product"] = "batch"
+        ret_flow_labels[_ZODIAC_PRODUCT_KEY] = "batch"
 
         return ret_flow_labels
 
     def _set_container_labels(self, container_op: ContainerOp):
         # TODO(talebz): A Metaflow plugin framework to customize tags, labels, etc.
-        container_op.add_pod_label("aip.zillowgroup.net/aip-wfsdk-pod", "true")
-
-        # https://github.com/argoproj/argo-workflows/issues/4525
-        # all argo workflows need istio-injection disabled, else the workflow hangs.
-        container_op.add_pod_label("sidecar.istio.io/inject", "false")
-
-        # add Flow labels as container labels
-        for key, value in KubeflowPipelines._get_flow_labels(
-            self.name, self.experiment, self.tags, self.sys_tags, self.username
-        ).items():
-            container_op.add_pod_label(key, value)
-
-        prefix = "metaflow.org"
-        container_op.add_pod_annotation(f"{prefix}/step", container_op.name)
-        container_op.add_pod_annotation(f"{prefix}/run_id", METAFLOW_RUN_ID)
-
-        # tags.ledger.zgtools.net/* pod labels required for the ZGCP Costs Ledger
-        container_op.add_pod_label("tags.ledger.zgtools.net/ai-flow-name", self.name)
-        container_op.add_pod_label(
-            "tags.ledger.zgtools.net/ai-step-name", container_op.name
-        )
+        # pod_labels/pod_annotations are plain dicts on the op, so one
+        # bulk update replaces a dozen add_pod_label/add_pod_annotation
+        # calls per step
+        labels = {
+            "aip.zillowgroup.net/aip-wfsdk-pod": "true",
+            # https://github.com/argoproj/argo-workflows/issues/4525
+            # all argo workflows need istio-injection disabled, else the workflow hangs.
+            "sidecar.istio.io/inject": "false",
+            # add Flow labels as container labels
+            **self.flow_labels,
+            # tags.ledger.zgtools.net/* pod labels required for the ZGCP Costs Ledger
+            "tags.ledger.zgtools.net/ai-flow-name": self.name,
+            "tags.ledger.zgtools.net/ai-step-name": container_op.name,
+        }
         if self.experiment:
-            container_op.add_pod_label(
-                "tags.ledger.zgtools.net/ai-experiment-name", self.experiment
-            )
+            labels["tags.ledger.zgtools.net/ai-experiment-name"] = self.experiment
+        container_op.pod_labels.update(labels)
 
+        annotations = {
+            _MF_STEP_KEY: container_op.name,
+            _MF_RUN_ID_KEY: METAFLOW_RUN_ID,
+        }
         if ZILLOW_ZODIAC_SERVICE and ZILLOW_ZODIAC_TEAM:
             # Add a logging topic annotation specific to the Zodiac service.
             # This is done to support user-supplied Zodiac service per AIP Notebook.
             # Please see comments on how and why ZILLOW_ZODIAC_SERVICE label for more.
-            container_op.add_pod_annotation(
-                "logging.zgtools.net/index",
-                f"log.fluentd-z1.{ZILLOW_ZODIAC_SERVICE}.dev",
-            )
+            annotations[
+                "logging.zgtools.net/index"
+            ] = f"log.fluentd-z1.{ZILLOW_ZODIAC_SERVICE}.dev"
+        container_op.pod_annotations.update(annotations)
 
     def create_kfp_pipeline_from_flow_graph(
         self,
@@ -1126,6 +1528,13 @@ class KubeflowPipelines(object):
             str, AIPComponent
         ] = self._create_aip_components_from_graph()
         flow_variables: FlowVariables = self._create_flow_variables()
+        # capture metaflow configs from client to be used at runtime
+        # client configs have the highest precedence; identical for every
+        # step, so built once per pipeline rather than once per node
+        metaflow_configs = dict(
+            METAFLOW_DATASTORE_SYSROOT_S3=DATASTORE_SYSROOT_S3,
+            METAFLOW_USER=METAFLOW_USER,
+        )
 
         def pipeline_transform(op: ContainerOp):
             if isinstance(op, ContainerOp):
@@ -1133,44 +1542,22 @@ class KubeflowPipelines(object):
 
                 # Disable caching because Metaflow doesn't have memoization
                 op.execution_options.caching_strategy.max_cache_staleness = "P0D"
-                env_vars = {
-                    "MF_POD_NAME": "metadata.name",
-                    "MF_POD_NAMESPACE": "metadata.namespace",
-                    "MF_ARGO_NODE_NAME": "metadata.annotations['workflows.argoproj.io/node-name']",
-                    "MF_ARGO_WORKFLOW_NAME": "metadata.labels['workflows.argoproj.io/workflow']",
-                    "ZODIAC_SERVICE": "metadata.labels['zodiac.zillowgroup.net/service']",
-                    "ZODIAC_TEAM": "metadata.labels['zodiac.zillowgroup.net/team']",
-                    "ZODIAC_OWNER": "metadata.labels['zodiac.zillowgroup.net/owner']",
-                }
-                for name, resource in env_vars.items():
-                    op.container.add_env_variable(
-                        V1EnvVar(
-                            name=name,
-                            value_from=V1EnvVarSource(
-                                field_ref=V1ObjectFieldSelector(field_path=resource)
-                            ),
-                        )
-                    )
-                # adding in additional env variable for spark to identify if workflow was
-                # launched from a notebook in an individual namespace.
-                env_vars = {
-                    "INDIVIDUAL_NAMESPACE": ZILLOW_INDIVIDUAL_NAMESPACE,
-                }
-                # add in env variable for ServiceAccount for Zillow Spark solution
-                if KUBERNETES_SERVICE_ACCOUNT:
-                    env_vars[
-                        "METAFLOW_KUBERNETES_SERVICE_ACCOUNT"
-                    ] = KUBERNETES_SERVICE_ACCOUNT
-                # need to be added separately from above as there is no valueFrom/fieldRef from the env
-                # var. leaving as a list format in the event future env variables need to be added without
-                # a fieldRef value_from similar to this env variable.
-                for name, resource in env_vars.items():
-                    op.container.add_env_variable(
-                        V1EnvVar(
-                            name=name,
-                            value=resource,
-                        )
-                    )
+                # the specs are identical for every op, so the shared
+                # prebuilt models are attached instead of constructing
+                # seven V1EnvVar objects per ContainerOp
+                for env_var in _POD_ENV_VARS:
+                    op.container.add_env_variable(env_var)
+
+                # the op transformer runs last, so only fill in the
+                # flow-wide pull policy where a step didn't set its own
+                if not op.container.image_pull_policy:
+                    op.container.set_image_pull_policy(self.image_pull_policy)
+
+                # the transformer sees every ContainerOp (steps, the s3
+                # sensor and exit handlers), so one annotation here
+                # covers all pod-creating ops
+                if self.enable_lazy_image_pull:
+                    op.add_pod_annotation("soci-snapshotter/enable", "true")
 
         pipeline_conf = None  # return variable
 
@@ -1181,6 +1568,9 @@ class KubeflowPipelines(object):
             """
             visited: Dict[str, ContainerOp] = {}
             visited_resource_ops: Dict[str, ResourceOp] = {}
+            # locals for the recursive hot path below
+            graph = self.graph
+            foreach_join_names = self.foreach_join_names
 
             def build_kfp_dag(
                 node: DAGNode,
@@ -1188,149 +1578,159 @@ class KubeflowPipelines(object):
                 preceding_kfp_component_op: ContainerOp = None,
                 preceding_component_outputs_dict: Dict[str, dsl.PipelineParam] = None,
             ):
-                if node.name in visited:
-                    return
-
-                if preceding_component_outputs_dict is None:
-                    preceding_component_outputs_dict = {}
-
-                # If any of this node's children has a preceding_kfp_func then
-                # create (kfp_decorator_component, preceding_component_inputs)
-                next_aip_decorator_component: Optional[AIPComponent] = None
-                preceding_component_inputs: List[str] = []
-                if any(
-                    step_name_to_aip_component[child].preceding_kfp_func
-                    for child in node.out_funcs
-                ):
-                    next_aip_decorator_component: AIPComponent = (
-                        step_name_to_aip_component[node.out_funcs[0]]
+                # Iterative DFS; only a foreach recurses because its
+                # subtree must be built inside the ParallelFor context
+                # manager (with its own passed_in_split_indexes).  The
+                # worklist is LIFO with children pushed in reverse, so
+                # ops are constructed in the same pre-order as the
+                # previous recursive version.
+                worklist = [
+                    (
+                        node,
+                        preceding_kfp_component_op,
+                        preceding_component_outputs_dict or {},
                     )
-                    # fields to return from Flow state to KFP
-                    preceding_component_inputs: List[
-                        str
-                    ] = next_aip_decorator_component.preceding_component_inputs
-
-                aip_component: AIPComponent = step_name_to_aip_component[node.name]
-                step_variables: StepVariables = self._create_step_variables(node)
-                # capture metaflow configs from client to be used at runtime
-                # client configs have the highest precedence
-                metaflow_configs = dict(
-                    METAFLOW_DATASTORE_SYSROOT_S3=DATASTORE_SYSROOT_S3,
-                    METAFLOW_USER=METAFLOW_USER,
-                )
-
-                metaflow_step_op: ContainerOp = self._create_metaflow_step_op(
-                    node,
-                    aip_component,
-                    step_variables,
-                    flow_variables,
-                    metaflow_configs,
-                    flow_parameters,
-                    passed_in_split_indexes,
-                    preceding_component_inputs,
-                    preceding_component_outputs_dict,
-                )
-                visited[node.name] = metaflow_step_op
-
-                if aip_component.environment_decorator:
-                    envs = aip_component.environment_decorator.attributes[
-                        "kubernetes_vars"
-                    ]
-                    for env in envs if envs else []:
-                        metaflow_step_op.container.add_env_variable(env)
-
-                if aip_component.total_retries and aip_component.total_retries > 0:
-                    metaflow_step_op.set_retry(
-                        aip_component.total_retries,
-                        policy="Always",
-                        backoff_duration=aip_component.minutes_between_retries,
-                        backoff_factor=aip_component.retry_backoff_factor,
+                ]
+                while worklist:
+                    (
+                        node,
+                        preceding_kfp_component_op,
+                        preceding_component_outputs_dict,
+                    ) = worklist.pop()
+                    if node.name in visited:
+                        continue
+
+                    # If any of this node's children has a preceding_kfp_func then
+                    # create (kfp_decorator_component, preceding_component_inputs)
+                    next_aip_decorator_component: Optional[AIPComponent] = None
+                    preceding_component_inputs: List[str] = []
+                    if any(
+                        step_name_to_aip_component[child].preceding_kfp_func
+                        for child in node.out_funcs
+                    ):
+                        next_aip_decorator_component: AIPComponent = (
+                            step_name_to_aip_component[node.out_funcs[0]]
+                        )
+                        # fields to return from Flow state to KFP
+                        preceding_component_inputs: List[
+                            str
+                        ] = next_aip_decorator_component.preceding_component_inputs
+
+                    aip_component: AIPComponent = step_name_to_aip_component[node.name]
+                    step_variables: StepVariables = self._create_step_variables(node)
+
+                    metaflow_step_op: ContainerOp = self._create_metaflow_step_op(
+                        node,
+                        aip_component,
+                        step_variables,
+                        flow_variables,
+                        metaflow_configs,
+                        flow_parameters,
+                        passed_in_split_indexes,
+                        preceding_component_inputs,
+                        preceding_component_outputs_dict,
                     )
+                    visited[node.name] = metaflow_step_op
 
-                if preceding_kfp_component_op:
-                    metaflow_step_op.after(preceding_kfp_component_op)
-
-                # If any of this node's children has a preceding_kfp_func then
-                # create (next_preceding_component_outputs_dict, next_aip_component_op)
-                # to pass along to next step
-                next_aip_component_op: Optional[ContainerOp] = None
-                next_preceding_component_outputs_dict: Dict[str, dsl.PipelineParam] = {}
-                if next_aip_decorator_component:
-                    next_aip_component_op: ContainerOp = next_aip_decorator_component.preceding_kfp_func(
-                        *[
-                            metaflow_step_op.outputs[mf_field]
-                            for mf_field in next_aip_decorator_component.preceding_component_inputs
+                    if aip_component.environment_decorator:
+                        envs = aip_component.environment_decorator.attributes[
+                            "kubernetes_vars"
                         ]
-                    )
-
-                    next_aip_component_op.after(metaflow_step_op)
+                        for env in envs if envs else []:
+                            metaflow_step_op.container.add_env_variable(env)
+
+                    if aip_component.total_retries and aip_component.total_retries > 0:
+                        metaflow_step_op.set_retry(
+                            aip_component.total_retries,
+                            policy="Always",
+                            backoff_duration=aip_component.minutes_between_retries,
+                            backoff_factor=aip_component.retry_backoff_factor,
+                        )
 
-                    num_outputs = len(
-                        next_aip_decorator_component.preceding_component_outputs
-                    )
-                    next_preceding_component_outputs_dict = {
-                        name: (
-                            next_aip_component_op.outputs[name]
-                            if num_outputs > 1
-                            else next_aip_component_op.output
+                    if preceding_kfp_component_op:
+                        metaflow_step_op.after(preceding_kfp_component_op)
+
+                    # If any of this node's children has a preceding_kfp_func then
+                    # create (next_preceding_component_outputs_dict, next_aip_component_op)
+                    # to pass along to next step
+                    next_aip_component_op: Optional[ContainerOp] = None
+                    next_preceding_component_outputs_dict: Dict[
+                        str, dsl.PipelineParam
+                    ] = {}
+                    if next_aip_decorator_component:
+                        next_aip_component_op: ContainerOp = next_aip_decorator_component.preceding_kfp_func(
+                            *[
+                                metaflow_step_op.outputs[mf_field]
+                                for mf_field in next_aip_decorator_component.preceding_component_inputs
+                            ]
                         )
-                        for name in next_aip_decorator_component.preceding_component_outputs
-                    }
 
-                KubeflowPipelines._set_container_resources(
-                    metaflow_step_op, aip_component
-                )
-                resource_op: ResourceOp = self._set_container_volume(
-                    metaflow_step_op, aip_component
-                )
-                if resource_op:
-                    visited_resource_ops[node.name] = resource_op
-
-                if node.type == "foreach":
-                    # Please see nested_parallelfor.ipynb for how this works
-                    next_step_name = node.out_funcs[0]
-                    with kfp.dsl.ParallelFor(
-                        metaflow_step_op.outputs["foreach_splits"]
-                    ) as split_index:
-                        # build_kfp_dag() will halt when a foreach join is
-                        # reached.
-                        # NOTE: A Metaflow foreach node can only have one child
-                        #  or one out_func
-                        build_kfp_dag(
-                            self.graph[next_step_name],
-                            split_index,
-                            preceding_kfp_component_op=next_aip_component_op,
-                            preceding_component_outputs_dict=next_preceding_component_outputs_dict,
+                        next_aip_component_op.after(metaflow_step_op)
+
+                        num_outputs = len(
+                            next_aip_decorator_component.preceding_component_outputs
                         )
+                        next_preceding_component_outputs_dict = {
+                            name: (
+                                next_aip_component_op.outputs[name]
+                                if num_outputs > 1
+                                else next_aip_component_op.output
+                            )
+                            for name in next_aip_decorator_component.preceding_component_outputs
+                        }
 
-                    # Handle the ParallelFor join step, and pass in
-                    # passed_in_split_indexes of parent context
-                    build_kfp_dag(
-                        self.graph[node.matching_join],
-                        passed_in_split_indexes,
-                        preceding_kfp_component_op=next_aip_component_op,
-                        preceding_component_outputs_dict=next_preceding_component_outputs_dict,
+                    KubeflowPipelines._set_container_resources(
+                        metaflow_step_op, aip_component
                     )
-                else:
-                    for step in node.out_funcs:
-                        step_node = self.graph[step]
-                        if (
-                            step_node.type == "join"
-                            and self.graph[step_node.split_parents[-1]].type
-                            == "foreach"
-                        ):
-                            # halt with a foreach join is reached
-                            # see the ParallelFor and adjacent call to build_kfp_dag()
-                            # which handles the ParallelFor join.
-                            return
-                        else:
+                    resource_op: ResourceOp = self._set_container_volume(
+                        metaflow_step_op, aip_component
+                    )
+                    if resource_op:
+                        visited_resource_ops[node.name] = resource_op
+
+                    if node.type == "foreach":
+                        # Please see nested_parallelfor.ipynb for how this works
+                        next_step_name = node.out_funcs[0]
+                        with kfp.dsl.ParallelFor(
+                            metaflow_step_op.outputs["foreach_splits"]
+                        ) as split_index:
+                            # build_kfp_dag() will halt when a foreach join is
+                            # reached.
+                            # NOTE: A Metaflow foreach node can only have one child
+                            #  or one out_func
                             build_kfp_dag(
-                                step_node,
-                                passed_in_split_indexes,
+                                graph[next_step_name],
+                                split_index,
                                 preceding_kfp_component_op=next_aip_component_op,
                                 preceding_component_outputs_dict=next_preceding_component_outputs_dict,
                             )
 
+                        # Handle the ParallelFor join step, processed with
+                        # the passed_in_split_indexes of the parent context
+                        worklist.append(
+                            (
+                                graph[node.matching_join],
+                                next_aip_component_op,
+                                next_preceding_component_outputs_dict,
+                            )
+                        )
+                    else:
+                        children = []
+                        for step in node.out_funcs:
+                            if step in foreach_join_names:
+                                # halt when a foreach join is reached
+                                # see the ParallelFor branch above which
+                                # schedules the ParallelFor join itself.
+                                break
+                            children.append(
+                                (
+                                    graph[step],
+                                    next_aip_component_op,
+                                    next_preceding_component_outputs_dict,
+                                )
+                            )
+                        worklist.extend(reversed(children))
+
             # The following exit handlers get created and added as a ContainerOp
             # and also as a parallel task to the Flow dag
             # We remove them and introduce a new dag invoked by Argo onExit
@@ -1351,7 +1751,7 @@ class KubeflowPipelines(object):
                 flow_variables,
             )
             build_kfp_dag(
-                self.graph["start"],
+                graph["start"],
             )
 
             # Instruct KFP of the DAG order by iterating over the Metaflow
@@ -1360,16 +1760,39 @@ class KubeflowPipelines(object):
             # order.
             # NOTE: It is the Metaflow compiler's job to check for cycles and a
             #   correctly constructed DAG (ex: splits and foreaches are joined).
-            for step in self.graph.nodes:
-                node = self.graph[step]
+            for name, node in self.graph.nodes.items():
+                op = visited[name]
+                resource_op = visited_resource_ops.get(name)
                 for parent_step in node.in_funcs:
-                    visited[node.name].after(visited[parent_step])
-                    if node.name in visited_resource_ops:
-                        visited_resource_ops[node.name].after(visited[parent_step])
+                    parent_op = visited[parent_step]
+                    op.after(parent_op)
+                    if resource_op is not None:
+                        resource_op.after(parent_op)
 
             if s3_sensor_op:
                 visited["start"].after(s3_sensor_op)
 
+            if self.enable_image_prewarm:
+                # one no-op pod per distinct step image, run in parallel
+                # with nothing upstream; each pull starts as soon as the
+                # workflow does rather than when the DAG reaches the
+                # first step using that image.  Pods cannot reach the
+                # node CRI socket, so the image's own pull (pause-style
+                # container) is the prewarm mechanism.
+                step_images = {
+                    component.aip_decorator.attributes["image"]
+                    if component.aip_decorator
+                    and component.aip_decorator.attributes["image"]
+                    else self.base_image
+                    for component in step_name_to_aip_component.values()
+                }
+                for index, image in enumerate(sorted(step_images)):
+                    dsl.ContainerOp(
+                        name=f"image-prewarm-{index}",
+                        image=image,
+                        command=["sh", "-c", "true"],
+                    ).set_display_name(f"image-prewarm-{index}")
+
             dsl.get_pipeline_conf().add_op_transformer(pipeline_transform)
             dsl.get_pipeline_conf().set_parallelism(self.max_parallelism)
             dsl.get_pipeline_conf().set_timeout(self.workflow_timeout)
@@ -1384,16 +1807,21 @@ class KubeflowPipelines(object):
         # replace the pipeline signature parameters with flow_parameters
         # and the pipeline name
         kfp_pipeline_from_flow.__name__ = self.name
-        kfp_pipeline_from_flow.__signature__ = inspect.signature(
-            kfp_pipeline_from_flow
-        ).replace(
-            parameters=[
-                inspect.Parameter(
-                    key, kind=inspect.Parameter.KEYWORD_ONLY, default=value
-                )
-                for key, value in flow_parameters.items()
-            ]
-        )
+        # the function is always declared as (**kwargs), so the signature
+        # is built directly from the parameters (and cached) instead of
+        # reflecting over the fresh function object each build
+        sig_key = _json_dumps_compact(flow_parameters)
+        signature = self._signatures.get(sig_key)
+        if signature is None:
+            signature = self._signatures[sig_key] = inspect.Signature(
+                parameters=[
+                    inspect.Parameter(
+                        key, kind=inspect.Parameter.KEYWORD_ONLY, default=value
+                    )
+                    for key, value in flow_parameters.items()
+                ]
+            )
+        kfp_pipeline_from_flow.__signature__ = signature
         return kfp_pipeline_from_flow, pipeline_conf
 
     def _create_metaflow_step_op(
@@ -1413,55 +1841,71 @@ class KubeflowPipelines(object):
         # double json.dumps() to ensure we have the correct quotation marks
         # on the outside of the string to be passed as a command line environment
         # and still be a valid JSON string when loaded by the Python module.
-        metaflow_execution_cmd: str = (
-            " && python -m metaflow.plugins.aip.aip_metaflow_step"
-            f' --volume_dir "{step_variables.volume_dir}"'
-            f" --environment {flow_variables.environment}"
-            f" --event_logger {flow_variables.event_logger}"
-            f" --flow_name {flow_variables.flow_name}"
-            f" --metaflow_configs_json {json.dumps(json.dumps(metaflow_configs))}"
-            f" --metaflow_run_id {METAFLOW_RUN_ID}"
-            f" --monitor {flow_variables.monitor}"
-            f' --passed_in_split_indexes "{passed_in_split_indexes}"'
-            f" --preceding_component_inputs_json {json.dumps(json.dumps(preceding_component_inputs))}"
-            f" --preceding_component_outputs_json {json.dumps(json.dumps(aip_component.preceding_component_outputs))}"
-            f" --script_name {os.path.basename(sys.argv[0])}"
-            f" --step_name {step_variables.step_name}"
-            f" --tags_json {json.dumps(json.dumps(flow_variables.tags))}"
-            f" --sys_tags_json {json.dumps(json.dumps(flow_variables.sys_tags))}"
-            f" --task_id {step_variables.task_id}"
-            f" --user_code_retries {step_variables.user_code_retries}"
-            + (
+
+        # flow_variables and metaflow_configs are fixed per pipeline, so
+        # the flag runs built purely from them are formatted once and
+        # reused for every step
+        if self._step_cmd_invariants is None:
+            self._step_cmd_invariants = (
+                f" --environment {flow_variables.environment}"
+                f" --event_logger {flow_variables.event_logger}"
+                f" --flow_name {flow_variables.flow_name}"
+                f" --metaflow_configs_json {json.dumps(json.dumps(metaflow_configs))}"
+                f" --metaflow_run_id {METAFLOW_RUN_ID}"
+                f" --monitor {flow_variables.monitor}",
+                f" --tags_json {json.dumps(json.dumps(flow_variables.tags))}"
+                f" --sys_tags_json {json.dumps(json.dumps(flow_variables.sys_tags))}",
+            )
+        flow_invariant_flags, tag_invariant_flags = self._step_cmd_invariants
+
+        # assembled as a list joined once at the end; repeated `+=` on a
+        # str reallocates the whole command on every append
+        cmd_parts: List[str] = [
+            " && python -m metaflow.plugins.aip.aip_metaflow_step",
+            f' --volume_dir "{step_variables.volume_dir}"',
+            flow_invariant_flags,
+            f' --passed_in_split_indexes "{passed_in_split_indexes}"',
+            f" --preceding_component_inputs_json {json.dumps(json.dumps(preceding_component_inputs))}",
+            f" --preceding_component_outputs_json {aip_component.preceding_component_outputs_json}",
+            f" --script_name {_SCRIPT_NAME}",
+            f" --step_name {step_variables.step_name}",
+            tag_invariant_flags,
+            f" --task_id {step_variables.task_id}",
+            f" --user_code_retries {step_variables.user_code_retries}",
+            (
                 " --is-interruptible "
                 if aip_component.interruptible_decorator
                 else " --not-interruptible "
-            )
-            + " --workflow_name {{workflow.name}}"
-        )
+            ),
+            " --workflow_name {{workflow.name}}",
+        ]
 
         if node.name == "start":
-            metaflow_execution_cmd += f" --flow_parameters_json '{FLOW_PARAMETERS_JSON if flow_parameters else []}'"
+            cmd_parts.append(
+                f" --flow_parameters_json '{FLOW_PARAMETERS_JSON if flow_parameters else []}'"
+            )
         if node.type == "foreach":
-            metaflow_execution_cmd += f" --is_foreach_step"
+            cmd_parts.append(" --is_foreach_step")
         if flow_variables.namespace:
-            metaflow_execution_cmd += f" --namespace {flow_variables.namespace}"
+            cmd_parts.append(f" --namespace {flow_variables.namespace}")
         if step_variables.is_split_index:
-            metaflow_execution_cmd += " --is_split_index"
+            cmd_parts.append(" --is_split_index")
         if node.type == "join":
-            metaflow_execution_cmd += " --is-join-step"
+            cmd_parts.append(" --is-join-step")
 
-        metaflow_execution_cmd += ' --preceding_component_outputs_dict "'
-        for key in preceding_component_outputs_dict:
+        cmd_parts.append(' --preceding_component_outputs_dict "')
+        for key, value in preceding_component_outputs_dict.items():
             # TODO: understand how KFP maps the parameter
-            metaflow_execution_cmd += f"{key}={preceding_component_outputs_dict[key]},"
-        metaflow_execution_cmd += '"'
+            cmd_parts.append(f"{key}={value},")
+        cmd_parts.append('"')
+        metaflow_execution_cmd: str = "".join(cmd_parts)
 
         # bash -ec used because Docker starts a single process and thus to run
         # multiple bash commands, we use bash -ec to chain them.
         command = [
             "bash",
             "-ec",
-            (f"{flow_variables.package_commands}" f"{metaflow_execution_cmd}"),
+            flow_variables.package_commands + metaflow_execution_cmd,
         ]
 
         if (
@@ -1476,21 +1920,27 @@ class KubeflowPipelines(object):
             None if node.name == "start" else {"flow_parameters_json": "None"}
         )
 
+        # built in one construction to avoid incremental resizes;
+        # the default card would be index 0, each @card adds the next
         file_outputs: Dict[str, str] = {
             "card": "/tmp/outputs/cards/card.html",
+            **{
+                f"card{i}": f"/tmp/outputs/cards/card{i}.html"
+                for i, deco in enumerate(
+                    (deco for deco in node.decorators if deco.name == "card"),
+                    start=1,
+                )
+            },
+            **(
+                {"foreach_splits": "/tmp/outputs/foreach_splits/data"}
+                if node.type == "foreach"
+                else {}
+            ),
+            **{
+                preceding_component_input: f"/tmp/outputs/{preceding_component_input}/data"
+                for preceding_component_input in preceding_component_inputs
+            },
         }
-        i = 1  # the default card would be i == 0
-        for deco in node.decorators:
-            if deco.name == "card":
-                file_outputs[f"card{i}"] = f"/tmp/outputs/cards/card{i}.html"
-                i = i + 1
-
-        if node.type == "foreach":
-            file_outputs["foreach_splits"] = "/tmp/outputs/foreach_splits/data"
-        for preceding_component_input in preceding_component_inputs:
-            file_outputs[
-                preceding_component_input
-            ] = f"/tmp/outputs/{preceding_component_input}/data"
 
         container_op = dsl.ContainerOp(
             name=node.name,
@@ -1499,6 +1949,13 @@ class KubeflowPipelines(object):
             artifact_argument_paths=artifact_argument_paths,
             file_outputs=file_outputs,
         ).set_display_name(node.name)
+
+        if aip_component.aip_decorator:
+            pull_policy = aip_component.aip_decorator.attributes.get(
+                "image_pull_policy"
+            )
+            if pull_policy:
+                container_op.container.set_image_pull_policy(pull_policy)
         return container_op
 
     def create_s3_sensor_op(
@@ -1534,9 +1991,14 @@ class KubeflowPipelines(object):
         # which couldn't be resolved when the path_formatter function was unpickled within the running
         # container. Instead, we took the approach of marshalling just the code of the path_formatter
         # function, and reconstructing the function within the aip_s3_sensor.py code.
+        # zlib + base64 keep the payload embedded in the workflow spec
+        # small: compression removes marshal's redundancy.  base64 (not
+        # base85, whose alphabet includes the braces Argo's template
+        # engine reserves for {{...}} tags) is shell-safe inside the
+        # quoted argv below.  Decoded in aip_s3_sensor.py.
         if path_formatter:
             path_formatter_code_encoded = base64.b64encode(
-                marshal.dumps(path_formatter.__code__)
+                zlib.compress(marshal.dumps(path_formatter.__code__), 9)
             ).decode("ascii")
         else:
             path_formatter_code_encoded = ""
@@ -1544,16 +2006,13 @@ class KubeflowPipelines(object):
         s3_sensor_command = [
             "bash",
             "-ec",
-            (
-                f"{package_commands}"
-                " && python -m metaflow.plugins.aip.aip_s3_sensor"
-                f" --run_id {METAFLOW_RUN_ID}"
-                f" --flow_name {self.name}"
-                f" --flow_parameters_json '{FLOW_PARAMETERS_JSON}'"
-                f" --path {path}"
-                f" --path_formatter_code_encoded '{path_formatter_code_encoded}'"
-                f" --polling_interval_seconds {polling_interval_seconds}"
-                f" --timeout_seconds {timeout_seconds}"
+            _S3_SENSOR_CMD_TEMPLATE.substitute(
+                package_commands=package_commands,
+                flow_name=self.name,
+                path=path,
+                path_formatter_code_encoded=path_formatter_code_encoded,
+                polling_interval_seconds=polling_interval_seconds,
+                timeout_seconds=timeout_seconds,
             ),
         ]
         if os_expandvars:
@@ -1566,14 +2025,7 @@ class KubeflowPipelines(object):
             file_outputs={"Output": "/tmp/outputs/Output/data"},
         ).set_display_name("s3_sensor")
 
-        KubeflowPipelines._set_minimal_container_resources(s3_sensor_op)
-        s3_sensor_op.set_retry(
-            AIP_S3_SENSOR_RETRY_COUNT,
-            policy="Always",
-            backoff_duration=BACKOFF_DURATION,
-            backoff_factor=RETRY_BACKOFF_FACTOR,
-        )
-        return s3_sensor_op
+        return _apply_policy(s3_sensor_op, _S3_SENSOR_POLICY)
 
     def _create_sqs_exit_handler_op(
         self,
@@ -1583,16 +2035,15 @@ class KubeflowPipelines(object):
         if not self.sqs_url_on_error:
             return None
 
-        env_variables: dict = {
-            key: from_conf(key)
-            for key in [
-                "ARGO_RUN_URL_PREFIX",
-            ]
-            if from_conf(key)
-        }
+        env_variables: dict = self._exit_handler_envs.get("sqs")
+        if env_variables is None:
+            env_variables = _conf_env_variables("ARGO_RUN_URL_PREFIX")
 
-        if self.sqs_role_arn_on_error:
-            env_variables["METAFLOW_SQS_ROLE_ARN_ON_ERROR"] = self.sqs_role_arn_on_error
+            if self.sqs_role_arn_on_error:
+                env_variables[
+                    "METAFLOW_SQS_ROLE_ARN_ON_ERROR"
+                ] = self.sqs_role_arn_on_error
+            self._exit_handler_envs["sqs"] = env_variables
 
         return self._get_aip_exit_handler_op(
             flow_parameters,
@@ -1610,23 +2061,22 @@ class KubeflowPipelines(object):
         if not self.notify:
             return None
 
-        env_variables: dict = {
-            key: from_conf(key)
-            for key in [
+        env_variables: dict = self._exit_handler_envs.get("notify")
+        if env_variables is None:
+            env_variables = _conf_env_variables(
                 "METAFLOW_NOTIFY_EMAIL_FROM",
                 "METAFLOW_NOTIFY_EMAIL_SMTP_HOST",
                 "METAFLOW_NOTIFY_EMAIL_SMTP_PORT",
                 "METAFLOW_NOTIFY_EMAIL_BODY",
                 "ARGO_RUN_URL_PREFIX",
-            ]
-            if from_conf(key)
-        }
+            )
 
-        if self.notify_on_error:
-            env_variables["METAFLOW_NOTIFY_ON_ERROR"] = self.notify_on_error
+            if self.notify_on_error:
+                env_variables["METAFLOW_NOTIFY_ON_ERROR"] = self.notify_on_error
 
-        if self.notify_on_success:
-            env_variables["METAFLOW_NOTIFY_ON_SUCCESS"] = self.notify_on_success
+            if self.notify_on_success:
+                env_variables["METAFLOW_NOTIFY_ON_SUCCESS"] = self.notify_on_success
+            self._exit_handler_envs["notify"] = env_variables
 
         return self._get_aip_exit_handler_op(
             flow_parameters,
@@ -1641,19 +2091,14 @@ class KubeflowPipelines(object):
         package_commands: str,
         flow_parameters: Dict,
     ) -> Optional[ContainerOp]:
-        udf_handler: Optional[FlowDecorator] = next(
-            (d for d in flow_decorators() if d.name == "exit_handler"), None
-        )
+        udf_handler: Optional[FlowDecorator] = self._udf_exit_handler
         if not udf_handler:
             return None
 
-        env_variables: dict = {
-            key: from_conf(key)
-            for key in [
-                "ARGO_RUN_URL_PREFIX",
-            ]
-            if from_conf(key)
-        }
+        env_variables: dict = self._exit_handler_envs.get("udf")
+        if env_variables is None:
+            env_variables = _conf_env_variables("ARGO_RUN_URL_PREFIX")
+            self._exit_handler_envs["udf"] = env_variables
 
         return self._get_user_defined_exit_handler_op(
             udf_handler,
@@ -1678,32 +2123,23 @@ class KubeflowPipelines(object):
         exit_handler_command = [
             "bash",
             "-ec",
-            (
-                f"{package_commands}"
-                " && python -m metaflow.plugins.aip.aip_exit_handler"
-                f" --flow_name {self.name}"
-                f" --run_id {METAFLOW_RUN_ID}"
-                f" --argo_workflow_uid {ARGO_WORKFLOW_UID}"
-                f" --env_variables_json {json.dumps(json.dumps(env_variables))}"
-                f" --flow_parameters_json {flow_parameters_json if flow_parameters else '{}'}"
-                "  --status {{workflow.status}}"
-                f" {flag}"
+            _EXIT_HANDLER_CMD_TEMPLATE.substitute(
+                package_commands=package_commands,
+                flow_name=self.name,
+                env_variables_json=shlex.quote(_json_dumps_compact(env_variables)),
+                flow_parameters_json=flow_parameters_json if flow_parameters else "{}",
+                flag=flag,
             ),
         ]
-        return (
-            dsl.ContainerOp(
-                name=name,
-                image=self.base_image,
-                command=exit_handler_command,
-            )
-            .set_display_name(name)
-            .set_retry(
-                EXIT_HANDLER_RETRY_COUNT,
-                policy="Always",
-                backoff_duration=BACKOFF_DURATION,
-                backoff_factor=RETRY_BACKOFF_FACTOR,
-            )
-        )
+        # the policy's explicit (small) requests keep the pod out of the
+        # best-effort QoS class, and its deadline stops a hung handler
+        # from pinning the workflow's terminal phase
+        exit_handler_op = dsl.ContainerOp(
+            name=name,
+            image=self.exit_handler_image,
+            command=exit_handler_command,
+        ).set_display_name(name)
+        return _apply_policy(exit_handler_op, _EXIT_HANDLER_POLICY)
 
     def _get_user_defined_exit_handler_op(
         self,
@@ -1718,8 +2154,6 @@ class KubeflowPipelines(object):
         # see https://github.com/argoproj/argo-workflows/issues/6036
         flow_parameters_json = f"'{FLOW_PARAMETERS_JSON}'"
 
-        top_level: str = "--quiet --no-pylint"
-
         # capture metaflow configs from client to be used at runtime
         # client configs have the highest precedence
         metaflow_configs = dict(
@@ -1730,34 +2164,42 @@ class KubeflowPipelines(object):
         exit_handler_command = [
             "bash",
             "-ec",
-            (
-                f"{package_commands}"
-                f" && METAFLOW_USER=aip-user python {os.path.basename(sys.argv[0])} {top_level} aip user-defined-exit-handler"
-                f" --flow_name {self.name}"
-                f" --run_id {METAFLOW_RUN_ID}"
-                f" --argo_workflow_uid {ARGO_WORKFLOW_UID}"
-                f" --env_variables_json {json.dumps(json.dumps(env_variables))}"
-                f" --flow_parameters_json {flow_parameters_json if flow_parameters else '{}'}"
-                "  --status {{workflow.status}}"
-                f" --metaflow_configs_json {json.dumps(json.dumps(metaflow_configs))}"
-                " --retries {{retries}}"
+            _UDF_EXIT_HANDLER_CMD_TEMPLATE.substitute(
+                package_commands=package_commands,
+                script_name=_SCRIPT_NAME,
+                flow_name=self.name,
+                env_variables_json=shlex.quote(_json_dumps_compact(env_variables)),
+                flow_parameters_json=flow_parameters_json if flow_parameters else "{}",
+                metaflow_configs_json=shlex.quote(
+                    _json_dumps_compact(metaflow_configs)
+                ),
             ),
         ]
 
+        # runs arbitrary user code, so the full step image is the safe
+        # default; @exit_handler(image=...) opts into a custom one
         container_op = dsl.ContainerOp(
             name=name,
-            image=self.base_image,
+            image=udf_handler.attributes.get("image") or self.base_image,
             command=exit_handler_command,
         ).set_display_name(name)
 
+        # floor at the minimal requests so a handler without
+        # @exit_handler_resources still escapes the best-effort QoS class
         func = udf_handler.attributes["func"]
-        if hasattr(func, "memory"):
+        if getattr(func, "memory", None):
             mem = KubeflowPipelines._to_k8s_resource_format("memory", func.memory)
             container_op.container.set_memory_request(mem)
             container_op.container.set_memory_limit(mem)
-        if hasattr(func, "cpu"):
+        else:
+            container_op.container.set_memory_request("200M")
+            container_op.container.set_memory_limit("200M")
+        if getattr(func, "cpu", None):
             container_op.container.set_cpu_request(func.cpu)
             container_op.container.set_cpu_limit(func.cpu)
+        else:
+            container_op.container.set_cpu_request("0.5")
+            container_op.container.set_cpu_limit("0.5")
 
         container_op.set_retry(
             getattr(func, "retries", EXIT_HANDLER_RETRY_COUNT),
@@ -1765,5 +2207,6 @@ class KubeflowPipelines(object):
             backoff_duration=f"{getattr(func, 'minutes_between_retries', BACKOFF_DURATION_INT)}m",
             backoff_factor=getattr(func, "retry_backoff_factor", RETRY_BACKOFF_FACTOR),
         )
+        container_op.set_timeout(EXIT_HANDLER_TIMEOUT_SECONDS)
 
         return container_op
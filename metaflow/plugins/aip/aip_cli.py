@@ -2,7 +2,8 @@ import functools
 import json
 import shutil
 import subprocess
-from typing import Dict, Any, Callable
+from dataclasses import dataclass
+from typing import Dict, Any, Callable, Optional, Tuple
 
 from metaflow import JSONType, current, decorators, parameters
 from metaflow._vendor import click
@@ -34,6 +35,53 @@ class IncorrectMetadataServiceVersion(MetaflowException):
     headline = "Incorrect version for metaflow service"
 
 
+# Notification defaults resolved once at import.  from_conf walks env
+# vars and the config file, and these feed the default= expressions of
+# the shared Click options built below.
+_CFG_NOTIFY = bool(from_conf("METAFLOW_NOTIFY"))
+_CFG_NOTIFY_ON_ERROR = from_conf("METAFLOW_NOTIFY_ON_ERROR", default=None)
+_CFG_NOTIFY_ON_SUCCESS = from_conf("METAFLOW_NOTIFY_ON_SUCCESS", default=None)
+_CFG_SQS_URL_ON_ERROR = from_conf("METAFLOW_SQS_URL_ON_ERROR", default=None)
+_CFG_SQS_ROLE_ARN_ON_ERROR = from_conf("METAFLOW_SQS_ROLE_ARN_ON_ERROR", default=None)
+
+
+@dataclass(frozen=True)
+class MakeFlowOpts:
+    """The arguments run and create share and hand down to make_flow."""
+
+    name: str
+    tags: Tuple[str, ...]
+    sys_tags: Tuple[str, ...]
+    experiment: Optional[str]
+    user_namespace: Optional[str]
+    base_image: Optional[str]
+    s3_code_package: bool
+    max_parallelism: Optional[int]
+    workflow_timeout: Optional[int]
+    notify: bool
+    notify_on_error: Optional[str]
+    notify_on_success: Optional[str]
+    sqs_url_on_error: Optional[str]
+    sqs_role_arn_on_error: Optional[str]
+
+
+@functools.lru_cache(maxsize=1)
+def _sanitize_k8s_name() -> Callable:
+    # deferred: kfp.compiler is a heavy import graph that only the
+    # trigger command needs; the first call pays it, later calls reuse
+    # the cached reference
+    from kfp.compiler._k8s_helper import sanitize_k8s_name
+
+    return sanitize_k8s_name
+
+
+@functools.lru_cache(maxsize=1)
+def _argo_path() -> Optional[str]:
+    # shutil.which walks and stats every $PATH entry; PATH does not
+    # change within a process, so one walk serves every caller
+    return shutil.which("argo")
+
+
 @click.group()
 def cli():
     pass
@@ -100,177 +148,197 @@ def step_init(obj, run_id, step_name, passed_in_split_indexes, task_id):
     )
 
 
+# The option set shared by the create/run/trigger commands.  Only --kind
+# depends on the factory parameter, so every other Option object is
+# allocated (and its help string parsed) once at import instead of once
+# per decorated command.
+_CREATE_RUN_OPTIONS_BEFORE_KIND = (
+    click.option(
+        "--name",
+        "--pipeline-name",
+        "name",
+        default=None,
+        help="The workflow name. The default is the flow name.",
+        show_default=True,
+    ),
+    click.option(
+        "--experiment",
+        "-e",
+        "experiment",
+        default=None,
+        help="The associated experiment name for the run. ",
+        show_default=True,
+    ),
+    click.option(
+        "--tag",
+        "tags",
+        multiple=True,
+        default=None,
+        help="Annotate all objects produced by Argo Workflows runs "
+        "with the given tag. You can specify this option multiple "
+        "times to attach multiple tags.",
+    ),
+    click.option(
+        "--sys-tag",
+        "sys_tags",
+        multiple=True,
+        default=None,
+        help="Annotate all Metaflow objects produced by Argo Metaflow runs "
+        "with the given system tag. You can specify this option multiple "
+        "times to attach multiple tags.",
+    ),
+    click.option(
+        "--namespace",
+        "user_namespace",
+        default=None,
+        help="Change the namespace from the default (production token) "
+        "to the given tag. See run --help for more information.",
+    ),
+    click.option(
+        "--k8s-namespace",
+        "--kubernetes-namespace",
+        "kubernetes_namespace",
+        default=KUBERNETES_NAMESPACE,
+        help="Kubernetes Namespace for your run in Argo.",
+        show_default=True,
+    ),
+    click.option(
+        "--yaml-only",
+        "yaml_only",
+        is_flag=True,
+        default=False,
+        help="Generate the Workflow YAML which is used to run the workflow on Argo.",
+        show_default=True,
+    ),
+)
+
+_CREATE_RUN_OPTIONS_AFTER_KIND = (
+    click.option(
+        "--pipeline-path",
+        "pipeline_path",
+        default=None,
+        help="The output path of the generated Argo pipeline yaml file",
+        show_default=False,
+    ),
+    click.option(
+        "--s3-code-package/--no-s3-code-package",
+        "s3_code_package",
+        default=True,
+        help="Whether to package the code to S3 datastore",
+        show_default=True,
+    ),
+    click.option(
+        "--base-image",
+        "base_image",
+        default=AIP_DEFAULT_CONTAINER_IMAGE,
+        help="Base docker image used in Argo.",
+        show_default=True,
+    ),
+    click.option(
+        "--max-parallelism",
+        "-m",
+        default=AIP_MAX_PARALLELISM,
+        show_default=True,
+        help="Maximum number of parallel pods within a single run.",
+    ),
+    click.option(
+        "--workflow-timeout",
+        default=None,
+        type=int,
+        help="Workflow timeout in seconds.",
+    ),
+    # TODO(talebz) AIP-7386 aip->argo: don't override max_run_concurrency with default
+    click.option(
+        "--max-run-concurrency",
+        default=AIP_MAX_RUN_CONCURRENCY,
+        help="Maximum number of parallel runs of this workflow triggered manually or by a recurring run."
+        f" defaults to {AIP_MAX_RUN_CONCURRENCY=}",
+    ),
+    click.option(
+        "--notify",
+        "-n",
+        "notify",
+        is_flag=True,
+        default=_CFG_NOTIFY,
+        help="Whether to notify upon completion.  Default is METAFLOW_NOTIFY env variable. "
+        "METAFLOW_NOTIFY_ON_SUCCESS and METAFLOW_NOTIFY_ON_ERROR env variables determine "
+        "whether a notification is sent.",
+        show_default=True,
+    ),
+    click.option(
+        "--notify-on-error",
+        "-noe",
+        "notify_on_error",
+        default=_CFG_NOTIFY_ON_ERROR,
+        help="Email address to notify upon error. "
+        "If not set, METAFLOW_NOTIFY_ON_ERROR is used from Metaflow config or environment variable",
+        show_default=True,
+    ),
+    click.option(
+        "--notify-on-success",
+        "-nos",
+        "notify_on_success",
+        default=_CFG_NOTIFY_ON_SUCCESS,
+        help="Email address to notify upon success"
+        "If not set, METAFLOW_NOTIFY_ON_SUCCESS is used from Metaflow config or environment variable",
+        show_default=True,
+    ),
+    click.option(
+        "--sqs-url-on-error",
+        "-su",
+        "sqs_url_on_error",
+        default=_CFG_SQS_URL_ON_ERROR,
+        help="SQS url to send messages upon error"
+        "If not set, messages will NOT be sent to SQS",
+        show_default=True,
+    ),
+    click.option(
+        "--sqs-role-arn-on-error",
+        "-sra",
+        "sqs_role_arn_on_error",
+        default=_CFG_SQS_ROLE_ARN_ON_ERROR,
+        help="aws iam role used for sending messages to SQS upon error"
+        "If not set, the default iam role associated with the pod will be used",
+        show_default=True,
+    ),
+)
+
+
 def common_create_run_options(default_yaml_kind: str):
-    def cli_decorator(func: Callable):
-        @click.option(
-            "--name",
-            "--pipeline-name",
-            "name",
-            default=None,
-            help="The workflow name. The default is the flow name.",
-            show_default=True,
-        )
-        @click.option(
-            "--experiment",
-            "-e",
-            "experiment",
-            default=None,
-            help="The associated experiment name for the run. ",
-            show_default=True,
-        )
-        @click.option(
-            "--tag",
-            "tags",
-            multiple=True,
-            default=None,
-            help="Annotate all objects produced by Argo Workflows runs "
-            "with the given tag. You can specify this option multiple "
-            "times to attach multiple tags.",
-        )
-        @click.option(
-            "--sys-tag",
-            "sys_tags",
-            multiple=True,
-            default=None,
-            help="Annotate all Metaflow objects produced by Argo Metaflow runs "
-            "with the given system tag. You can specify this option multiple "
-            "times to attach multiple tags.",
-        )
-        @click.option(
-            "--namespace",
-            "user_namespace",
-            default=None,
-            help="Change the namespace from the default (production token) "
-            "to the given tag. See run --help for more information.",
-        )
-        @click.option(
-            "--k8s-namespace",
-            "--kubernetes-namespace",
-            "kubernetes_namespace",
-            default=KUBERNETES_NAMESPACE,
-            help="Kubernetes Namespace for your run in Argo.",
-            show_default=True,
-        )
-        @click.option(
-            "--yaml-only",
-            "yaml_only",
-            is_flag=True,
-            default=False,
-            help="Generate the Workflow YAML which is used to run the workflow on Argo.",
-            show_default=True,
-        )
-        @click.option(
-            "--kind",
-            "kind",
-            default=default_yaml_kind,
-            type=click.Choice(
-                ["Workflow", "WorkflowTemplate", "CronWorkflow", "ConfigMap"]
-            ),
-            help="The kind of the generated k8s yaml.  Only used when --yaml-only is set."
-            "It specifies the k8s kind of the yaml file created.  The ConfigMap value "
-            "is used to create a ConfigMap with an Argo synchronization semaphore whose "
-            "value is set by the --max-run-concurrency command line parameter",
-            show_default=True,
-        )
-        @click.option(
-            "--pipeline-path",
-            "pipeline_path",
-            default=None,
-            help="The output path of the generated Argo pipeline yaml file",
-            show_default=False,
-        )
-        @click.option(
-            "--s3-code-package/--no-s3-code-package",
-            "s3_code_package",
-            default=True,
-            help="Whether to package the code to S3 datastore",
-            show_default=True,
-        )
-        @click.option(
-            "--base-image",
-            "base_image",
-            default=AIP_DEFAULT_CONTAINER_IMAGE,
-            help="Base docker image used in Argo.",
-            show_default=True,
-        )
-        @click.option(
-            "--max-parallelism",
-            "-m",
-            default=AIP_MAX_PARALLELISM,
-            show_default=True,
-            help="Maximum number of parallel pods within a single run.",
-        )
-        @click.option(
-            "--workflow-timeout",
-            default=None,
-            type=int,
-            help="Workflow timeout in seconds.",
-        )
-        # TODO(talebz) AIP-7386 aip->argo: don't override max_run_concurrency with default
-        @click.option(
-            "--max-run-concurrency",
-            default=AIP_MAX_RUN_CONCURRENCY,
-            help="Maximum number of parallel runs of this workflow triggered manually or by a recurring run."
-            f" defaults to {AIP_MAX_RUN_CONCURRENCY=}",
-        )
-        @click.option(
-            "--notify",
-            "-n",
-            "notify",
-            is_flag=True,
-            default=bool(from_conf("METAFLOW_NOTIFY")),
-            help="Whether to notify upon completion.  Default is METAFLOW_NOTIFY env variable. "
-            "METAFLOW_NOTIFY_ON_SUCCESS and METAFLOW_NOTIFY_ON_ERROR env variables determine "
-            "whether a notification is sent.",
-            show_default=True,
-        )
-        @click.option(
-            "--notify-on-error",
-            "-noe",
-            "notify_on_error",
-            default=from_conf("METAFLOW_NOTIFY_ON_ERROR", default=None),
-            help="Email address to notify upon error. "
-            "If not set, METAFLOW_NOTIFY_ON_ERROR is used from Metaflow config or environment variable",
-            show_default=True,
-        )
-        @click.option(
-            "--notify-on-success",
-            "-nos",
-            "notify_on_success",
-            default=from_conf("METAFLOW_NOTIFY_ON_SUCCESS", default=None),
-            help="Email address to notify upon success"
-            "If not set, METAFLOW_NOTIFY_ON_SUCCESS is used from Metaflow config or environment variable",
-            show_default=True,
-        )
-        @click.option(
-            "--sqs-url-on-error",
-            "-su",
-            "sqs_url_on_error",
-            default=from_conf("METAFLOW_SQS_URL_ON_ERROR", default=None),
-            help="SQS url to send messages upon error"
-            "If not set, messages will NOT be sent to SQS",
-            show_default=True,
-        )
-        @click.option(
-            "--sqs-role-arn-on-error",
-            "-sra",
-            "sqs_role_arn_on_error",
-            default=from_conf("METAFLOW_SQS_ROLE_ARN_ON_ERROR", default=None),
-            help="aws iam role used for sending messages to SQS upon error"
-            "If not set, the default iam role associated with the pod will be used",
-            show_default=True,
-        )
-        @functools.wraps(func)
-        def wrapper_common_options(*args, **kwargs):
-            return func(*args, **kwargs)
+    kind_option = click.option(
+        "--kind",
+        "kind",
+        default=default_yaml_kind,
+        type=click.Choice(
+            ["Workflow", "WorkflowTemplate", "CronWorkflow", "ConfigMap"]
+        ),
+        help="The kind of the generated k8s yaml.  Only used when --yaml-only is set."
+        "It specifies the k8s kind of the yaml file created.  The ConfigMap value "
+        "is used to create a ConfigMap with an Argo synchronization semaphore whose "
+        "value is set by the --max-run-concurrency command line parameter",
+        show_default=True,
+    )
 
-        return wrapper_common_options
+    def cli_decorator(func: Callable) -> Callable:
+        options = (
+            _CREATE_RUN_OPTIONS_BEFORE_KIND
+            + (kind_option,)
+            + _CREATE_RUN_OPTIONS_AFTER_KIND
+        )
+        # Click decorators compose through __click_params__; applying them
+        # directly to func drops the pass-through wrapper frame (and its
+        # functools.wraps attribute copy) from every CLI invocation
+        for option in reversed(options):
+            func = option(func)
+        return func
 
     return cli_decorator
 
 
-def common_wait_options(func):
-    @click.option(
+# built once at import; Click Option objects are stateless and can be
+# shared by every command they decorate
+_WAIT_OPTIONS = (
+    click.option(
         "--wait-for-completion-timeout",
         "--wait-timeout",
         "-wt",
@@ -278,8 +346,8 @@ def common_wait_options(func):
         default=None,
         type=int,
         help="Completion timeout (seconds) to wait before flow exits, else TimeoutExpired is raised.",
-    )
-    @click.option(
+    ),
+    click.option(
         "--argo-wait",
         "-aw",
         "argo_wait",
@@ -287,12 +355,14 @@ def common_wait_options(func):
         default=False,
         help="Use Argo CLI watch to wait for Argo run to complete.",
         show_default=True,
-    )
-    @functools.wraps(func)
-    def wrapper_common_options(*args, **kwargs):
-        return func(*args, **kwargs)
+    ),
+)
+
 
-    return wrapper_common_options
+def common_wait_options(func: Callable) -> Callable:
+    for option in reversed(_WAIT_OPTIONS):
+        func = option(func)
+    return func
 
 
 @parameters.add_custom_parameters(deploy_mode=True)
@@ -338,21 +408,23 @@ def run(
     obj.check(obj.graph, obj.flow, obj.environment, pylint=obj.pylint)
     check_metadata_service_version(obj)
     flow = make_flow(
-        obj=obj,
-        name=name if name else obj.flow.name,
-        tags=tags,
-        sys_tags=sys_tags,
-        experiment=experiment,
-        user_namespace=user_namespace,
-        base_image=base_image,
-        s3_code_package=s3_code_package,
-        max_parallelism=max_parallelism,
-        workflow_timeout=workflow_timeout,
-        notify=notify,
-        notify_on_error=notify_on_error,
-        notify_on_success=notify_on_success,
-        sqs_url_on_error=sqs_url_on_error,
-        sqs_role_arn_on_error=sqs_role_arn_on_error,
+        obj,
+        MakeFlowOpts(
+            name=name if name else obj.flow.name,
+            tags=tags,
+            sys_tags=sys_tags,
+            experiment=experiment,
+            user_namespace=user_namespace,
+            base_image=base_image,
+            s3_code_package=s3_code_package,
+            max_parallelism=max_parallelism,
+            workflow_timeout=workflow_timeout,
+            notify=notify,
+            notify_on_error=notify_on_error,
+            notify_on_success=notify_on_success,
+            sqs_url_on_error=sqs_url_on_error,
+            sqs_role_arn_on_error=sqs_role_arn_on_error,
+        ),
     )
 
     if yaml_only:
@@ -404,15 +476,18 @@ def run(
 
 
 def _get_flow_parameters(kwargs, obj) -> Dict[str, Any]:
-    def _convert_value(param: parameters.Parameter):
-        v = kwargs.get(param.name)
-        return json.dumps(v) if param.kwargs.get("type") == JSONType else v
-
-    flow_parameters = {
-        param.name: _convert_value(param)
-        for _, param in obj.flow._get_parameters()
-        if kwargs.get(param.name) is not None
-    }
+    # single pass with one kwargs.get per parameter; the previous
+    # comprehension looked each value up twice (filter and convert)
+    flow_parameters: Dict[str, Any] = {}
+    kwargs_get = kwargs.get
+    json_type = JSONType
+    for _, param in obj.flow._get_parameters():
+        value = kwargs_get(param.name)
+        if value is None:
+            continue
+        if param.kwargs.get("type") == json_type:
+            value = json.dumps(value)
+        flow_parameters[param.name] = value
     return flow_parameters
 
 
@@ -430,7 +505,7 @@ def _echo_workflow_run(
     obj.echo(f"*Argo UI:* {argo_ui_url}", fg="cyan")
     if AIP_SHOW_METAFLOW_UI_URL:
         obj.echo(f"*Metaflow UI:* {metaflow_ui_url}", fg="cyan")
-    if shutil.which("argo"):
+    if _argo_path():
         # only print this to the console if `argo` is in the path
         obj.echo(
             f"*Argo workflow:* argo -n {kubernetes_namespace} watch {argo_workflow_name}\n",
@@ -448,18 +523,33 @@ def _argo_wait(
     obj,
     wait_for_completion_timeout,
 ):
-    argo_path: str = shutil.which("argo")
-    argo_cmd = f"{argo_path} -n {kubernetes_namespace} "
-    cmd = f"{argo_cmd} watch {argo_workflow_name}"
+    argo_path: Optional[str] = _argo_path()
+    if argo_path is None:
+        raise CommandException(
+            "Could not find the argo CLI on $PATH. Install argo to use "
+            "--argo-wait, or track the run at: " + argo_ui_url
+        )
     subprocess.run(
-        cmd,
-        shell=True,
+        [argo_path, "-n", kubernetes_namespace, "watch", argo_workflow_name],
         universal_newlines=True,
         timeout=wait_for_completion_timeout,
     )
-    cmd = f"{argo_cmd} get {argo_workflow_name} | grep Status | awk '{{print $2}}'"
-    ret = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, encoding="utf8")
-    succeeded = "Succeeded" in ret.stdout
+    # one argv-exec'd jsonpath query instead of a shell forking
+    # sh + grep + awk to scrape the human-formatted status table
+    ret = subprocess.run(
+        [
+            argo_path,
+            "-n",
+            kubernetes_namespace,
+            "get",
+            argo_workflow_name,
+            "-o",
+            "jsonpath={.status.phase}",
+        ],
+        stdout=subprocess.PIPE,
+        encoding="utf8",
+    )
+    succeeded = ret.stdout.strip() == "Succeeded"
     show_status(metaflow_run_id, argo_ui_url, metaflow_ui_url, obj.echo, succeeded)
 
 
@@ -534,21 +624,23 @@ def create(
 
     check_metadata_service_version(obj)
     flow = make_flow(
-        obj=obj,
-        name=obj.flow.name,
-        tags=tags,
-        sys_tags=sys_tags,
-        experiment=experiment,
-        user_namespace=user_namespace,
-        base_image=base_image,
-        s3_code_package=s3_code_package,
-        max_parallelism=max_parallelism,
-        workflow_timeout=workflow_timeout,
-        notify=notify,
-        notify_on_error=notify_on_error,
-        notify_on_success=notify_on_success,
-        sqs_url_on_error=sqs_url_on_error,
-        sqs_role_arn_on_error=sqs_role_arn_on_error,
+        obj,
+        MakeFlowOpts(
+            name=obj.flow.name,
+            tags=tags,
+            sys_tags=sys_tags,
+            experiment=experiment,
+            user_namespace=user_namespace,
+            base_image=base_image,
+            s3_code_package=s3_code_package,
+            max_parallelism=max_parallelism,
+            workflow_timeout=workflow_timeout,
+            notify=notify,
+            notify_on_error=notify_on_error,
+            notify_on_success=notify_on_success,
+            sqs_url_on_error=sqs_url_on_error,
+            sqs_role_arn_on_error=sqs_role_arn_on_error,
+        ),
     )
 
     if yaml_only:
@@ -607,10 +699,9 @@ def trigger(
     **kwargs,
 ):
     from metaflow.plugins.aip.aip import KubeflowPipelines
-    from kfp.compiler._k8s_helper import sanitize_k8s_name
 
     flow_parameters: Dict[str, Any] = _get_flow_parameters(kwargs, obj)
-    workflow_name: str = name if name else sanitize_k8s_name(obj.flow.name)
+    workflow_name: str = name if name else _sanitize_k8s_name()(obj.flow.name)
     workflow_manifest: Dict[str, Any] = KubeflowPipelines.trigger(
         kubernetes_namespace, workflow_name, flow_parameters
     )
@@ -653,23 +744,7 @@ def show_status(
         )
 
 
-def make_flow(
-    obj,
-    name,
-    tags,
-    sys_tags,
-    experiment,
-    user_namespace,
-    base_image,
-    s3_code_package,
-    max_parallelism,
-    workflow_timeout,
-    notify,
-    notify_on_error,
-    notify_on_success,
-    sqs_url_on_error,
-    sqs_role_arn_on_error,
-):
+def make_flow(obj, opts: MakeFlowOpts):
     """
     Analogous to step_functions_cli.py
     """
@@ -691,7 +766,7 @@ def make_flow(
     )
 
     package_url = None
-    if s3_code_package:
+    if opts.s3_code_package:
         package_url, package_sha = obj.flow_datastore.save_data(
             [obj.package.blob], len_hint=1
         )[0]
@@ -701,7 +776,7 @@ def make_flow(
         )
 
     return KubeflowPipelines(
-        name=name,
+        name=opts.name,
         graph=obj.graph,
         flow=obj.flow,
         code_package=obj.package,
@@ -711,18 +786,18 @@ def make_flow(
         environment=obj.environment,
         event_logger=obj.event_logger,
         monitor=obj.monitor,
-        base_image=base_image,
-        s3_code_package=s3_code_package,
-        tags=tags,
-        sys_tags=sys_tags,
-        experiment=experiment,
-        namespace=user_namespace,
+        base_image=opts.base_image,
+        s3_code_package=opts.s3_code_package,
+        tags=opts.tags,
+        sys_tags=opts.sys_tags,
+        experiment=opts.experiment,
+        namespace=opts.user_namespace,
         username=get_username(),
-        max_parallelism=max_parallelism,
-        workflow_timeout=workflow_timeout,
-        notify=notify,
-        notify_on_error=notify_on_error,
-        notify_on_success=notify_on_success,
-        sqs_url_on_error=sqs_url_on_error,
-        sqs_role_arn_on_error=sqs_role_arn_on_error,
+        max_parallelism=opts.max_parallelism,
+        workflow_timeout=opts.workflow_timeout,
+        notify=opts.notify,
+        notify_on_error=opts.notify_on_error,
+        notify_on_success=opts.notify_on_success,
+        sqs_url_on_error=opts.sqs_url_on_error,
+        sqs_role_arn_on_error=opts.sqs_role_arn_on_error,
     )
@@ -12,6 +12,9 @@ SPLIT_INDEX_ENV_NAME = "SPLIT_INDEX_ENV_NAME"
 INPUT_PATHS_ENV_NAME = "INPUT_PATHS_ENV_NAME"
 RETRY_COUNT = "MF_ATTEMPT"
 EXIT_HANDLER_RETRY_COUNT = 7
+# per-attempt deadline for exit handler pods; a hung handler otherwise
+# pins the workflow in its terminal phase indefinitely
+EXIT_HANDLER_TIMEOUT_SECONDS = 600
 BACKOFF_DURATION_INT = 2
 BACKOFF_DURATION = f"{BACKOFF_DURATION_INT}m"
 RETRY_BACKOFF_FACTOR = 3  # 2 * 3 * 3 * 3 = 54 minutes
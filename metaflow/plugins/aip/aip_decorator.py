@@ -47,6 +47,11 @@ class AIPInternalDecorator(StepDecorator):
         python <flow_name>.py aip run --base-image <image-url>
       2. AIP_CONTAINER_IMAGE defined in metaflow_config.py
 
+    image_pull_policy: str
+      Defaults to None, which leaves the step on the flow-wide policy
+      (IfNotPresent).  Set to "Always" for steps whose image tag is
+      re-pushed, ex: a :latest development image.
+
     @step
     @aip(
         preceding_component=my_step_op_func,
@@ -64,6 +69,7 @@ class AIPInternalDecorator(StepDecorator):
         "preceding_component_inputs": [],
         "preceding_component_outputs": [],
         "image": None,
+        "image_pull_policy": None,
     }
 
     def __init__(self, attributes=None, statically_defined=False):
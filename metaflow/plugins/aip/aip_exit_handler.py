@@ -1,6 +1,10 @@
+import json
+import logging
+import os
+from functools import lru_cache
 from typing import Dict
+
 from metaflow._vendor import click
-import logging
 
 from metaflow.plugins.aip import run_id_to_url
 
@@ -40,11 +44,6 @@ def exit_handler(
         MF_ARGO_WORKFLOW_NAME
         METAFLOW_NOTIFY_EMAIL_BODY
     """
-    import json
-    import os
-    import boto3
-    from botocore.session import Session
-
     env_variables: Dict[str, str] = json.loads(env_variables_json)
 
     def get_env(name, default=None) -> str:
@@ -85,16 +84,27 @@ def exit_handler(
         mime_text = MIMEText(body, "html")
         msg.attach(mime_text)
 
-        s = smtplib.SMTP(smtp_host, smtp_port)
+        # bounded: an unresponsive SMTP host (DNS, TLS handshake) must
+        # not hold the exit-handler pod, and with it workflow
+        # termination, open indefinitely
+        s = smtplib.SMTP(smtp_host, smtp_port, timeout=5)
         s.sendmail(email_from, send_to, msg.as_string())
         s.quit()
         print(msg)
 
-    def get_aws_session(role_arn: str = None) -> Session:
+    @lru_cache(maxsize=8)
+    def get_aws_session(role_arn: str = None) -> "boto3.Session":
+        # memoized per role_arn: AssumeRole is a ~100-300ms STS round
+        # trip, and DeferredRefreshableCredentials keeps the cached
+        # session valid for the handler's lifetime
+        # boto3 import costs hundreds of ms loading service models; only
+        # the SQS-on-error path pays it, not the notify-email-only one
+        import boto3
         from botocore.credentials import (
             AssumeRoleCredentialFetcher,
             DeferredRefreshableCredentials,
         )
+        from botocore.session import Session
 
         region_name = "us-west-2"
         source_session = boto3.Session(region_name=region_name)
@@ -119,15 +129,56 @@ def exit_handler(
         return boto3.Session(botocore_session=botocore_session, region_name=region_name)
 
     def send_sqs_message(queue_url: str, message_body: str, *, role_arn: str = None):
+        import concurrent.futures
+
+        from botocore.config import Config
+
         try:
             # Create session from given iam role
             session = get_aws_session(role_arn)
 
-            # Create an SQS client from the session
-            sqs = session.client("sqs")
+            # A slow SQS request here holds up the whole workflow's
+            # terminal phase, so each attempt gets tight timeouts and no
+            # botocore-internal retries.
+            config = Config(
+                connect_timeout=2, read_timeout=3, retries={"max_attempts": 1}
+            )
 
-            # Send message to SQS queue
-            response = sqs.send_message(QueueUrl=queue_url, MessageBody=message_body)
+            def attempt() -> Dict:
+                # Create an SQS client from the session
+                sqs = session.client("sqs", config=config)
+
+                # Send message to SQS queue
+                return sqs.send_message(QueueUrl=queue_url, MessageBody=message_body)
+
+            # Hedged send: if the first request hasn't completed within
+            # 2s, fire a duplicate and take whichever finishes first.  A
+            # standard queue may then deliver the message twice, which is
+            # acceptable for an on-error notification.  Total wall time
+            # is capped at 10s.
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+            try:
+                first = executor.submit(attempt)
+                try:
+                    response = first.result(timeout=2)
+                except concurrent.futures.TimeoutError:
+                    second = executor.submit(attempt)
+                    response = None
+                    last_err: Exception = None
+                    for future in concurrent.futures.as_completed(
+                        [first, second], timeout=8
+                    ):
+                        try:
+                            response = future.result()
+                            break
+                        except Exception as send_err:
+                            last_err = send_err
+                    if response is None:
+                        raise last_err if last_err else TimeoutError(
+                            f"send_message to {queue_url} did not complete in 10s"
+                        )
+            finally:
+                executor.shutdown(wait=False)
 
             _logger.debug(
                 f"Successfully sent the message {message_body} "
@@ -141,6 +192,11 @@ def exit_handler(
             raise err
 
     print(f"Flow completed with status={status}")
+
+    # the two notification paths are independent network calls, so when
+    # both are requested they run on separate threads instead of
+    # serializing SMTP behind SQS (or vice versa)
+    notify_task = None
     if run_email_notify:
         notify_on_error = get_env("METAFLOW_NOTIFY_ON_ERROR")
         notify_on_success = get_env("METAFLOW_NOTIFY_ON_SUCCESS")
@@ -148,12 +204,13 @@ def exit_handler(
         # AIP-8098 ExitHandler and Ops notification NOT called on Workflow.status == Error
         #   available statuses of Succeeded, Failed, Error
         if notify_on_success and status == "Succeeded":
-            email_notify(notify_on_success)
+            notify_task = lambda: email_notify(notify_on_success)
         elif notify_on_error:
-            email_notify(notify_on_error)
+            notify_task = lambda: email_notify(notify_on_error)
         else:
             print("No notification is necessary!")
 
+    sqs_task = None
     if run_sqs_on_error:
         # Send message to SQS if 'METAFLOW_SQS_URL_ON_ERROR' is set
         metaflow_sqs_url_on_error = get_env("METAFLOW_SQS_URL_ON_ERROR")
@@ -166,15 +223,32 @@ def exit_handler(
                 metaflow_sqs_role_arn_on_error = get_env(
                     "METAFLOW_SQS_ROLE_ARN_ON_ERROR"
                 )
-                send_sqs_message(
-                    metaflow_sqs_url_on_error,
-                    message_body,
-                    role_arn=metaflow_sqs_role_arn_on_error,
-                )
-                print(f"message was sent to: {metaflow_sqs_url_on_error} successfully")
+
+                def sqs_task():
+                    send_sqs_message(
+                        metaflow_sqs_url_on_error,
+                        message_body,
+                        role_arn=metaflow_sqs_role_arn_on_error,
+                    )
+                    print(
+                        f"message was sent to: {metaflow_sqs_url_on_error} successfully"
+                    )
+
         else:
             print("SQS is not configured!")
 
+    tasks = [task for task in (notify_task, sqs_task) if task is not None]
+    if len(tasks) > 1:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+            # materialize first so both are in flight before the
+            # (exception-raising) result() calls
+            for future in [executor.submit(task) for task in tasks]:
+                future.result()
+    elif tasks:
+        tasks[0]()
+
 
 if __name__ == "__main__":
     exit_handler()
@@ -10,6 +10,7 @@ import marshal
 import os
 import pathlib
 import time
+import zlib
 from typing import Dict, Tuple
 from urllib.parse import ParseResult, urlparse
 
@@ -78,8 +79,9 @@ def wait_for_s3_path(
     if path_formatter_code_encoded:
         # path_formatter_code is of type `code object`,
         # see: https://docs.python.org/3/c-api/code.html
+        # encoded as base64(zlib(marshal)) in aip.py _create_s3_sensor_op
         path_formatter_code = marshal.loads(
-            base64.b64decode(path_formatter_code_encoded)
+            zlib.decompress(base64.b64decode(path_formatter_code_encoded))
         )
 
         def path_formatter_template(key: str, flow_parameters: dict) -> str:
@@ -36,14 +36,16 @@ def invoke_user_defined_exit_handler(
     """
     import json
     import os
+    from collections import ChainMap
 
     env_variables: Dict[str, str] = json.loads(env_variables_json)
 
-    def get_env(name, default=None) -> str:
-        return env_variables.get(name, os.environ.get(name, default=default))
+    # shipped env variables first, process environment as fallback; the
+    # C-implemented ChainMap lookup replaces a per-name helper function
+    env = ChainMap(env_variables, os.environ)
 
-    argo_workflow_name = get_env("MF_ARGO_WORKFLOW_NAME", "")
-    k8s_namespace = get_env("POD_NAMESPACE", "")
+    argo_workflow_name = env.get("MF_ARGO_WORKFLOW_NAME", "")
+    k8s_namespace = env.get("POD_NAMESPACE", "")
     argo_ui_url = run_id_to_url(argo_workflow_name, k8s_namespace, argo_workflow_uid)
 
     metaflow_configs: Dict[str, str] = json.loads(metaflow_configs_json)
@@ -64,12 +66,17 @@ def invoke_user_defined_exit_handler(
 
     print(f"Flow completed with status={status}")
 
-    udf_exit_handler: FlowDecorator = next(
-        d for d in flow_decorators() if d.name == "exit_handler"
-    )
+    # dict lookup rather than a linear scan with per-decorator string
+    # comparisons; KeyError on a missing handler is as loud as the
+    # StopIteration the previous next() raised
+    decorators_by_name: Dict[str, FlowDecorator] = {
+        decorator.name: decorator for decorator in flow_decorators()
+    }
+    udf_exit_handler: FlowDecorator = decorators_by_name["exit_handler"]
+    flow_parameters: Dict = json.loads(flow_parameters_json)
     udf_exit_handler.attributes["func"](
         status=status,
-        flow_parameters=json.loads(flow_parameters_json),
+        flow_parameters=flow_parameters,
         argo_workflow_run_name=argo_workflow_name,
         metaflow_run_id=run_id,
         argo_ui_url=argo_ui_url,
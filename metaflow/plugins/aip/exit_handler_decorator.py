@@ -124,6 +124,9 @@ class ExitHandlerDecorator(FlowDecorator):
         "func": None,
         "on_failure": True,
         "on_success": False,
+        # container image to run the handler in; None uses the flow's
+        # full step image, which any user-defined func can rely on
+        "image": None,
     }
 
     def flow_init(
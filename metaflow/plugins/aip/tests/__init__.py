@@ -15,11 +15,14 @@ def obtain_flow_file_paths(flow_dir_path: str, ignore_flows=None) -> List[str]:
     if ignore_flows is None:
         ignore_flows = []
 
-    file_paths: List[str] = [
-        file_name
-        for file_name in os.listdir(flow_dir_path)
-        if os.path.isfile(os.path.join(flow_dir_path, file_name))
-        and not file_name.startswith(".")
-        and not file_name in ignore_flows
-    ]
+    # scandir reuses the file-type info returned by the directory read,
+    # avoiding the extra stat() per entry that listdir + isfile issued
+    with os.scandir(flow_dir_path) as entries:
+        file_paths: List[str] = [
+            entry.name
+            for entry in entries
+            if entry.is_file()
+            and not entry.name.startswith(".")
+            and not entry.name in ignore_flows
+        ]
     return file_paths
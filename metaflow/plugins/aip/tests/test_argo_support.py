@@ -15,49 +15,60 @@ disabled_test_flows = [
 @pytest.mark.parametrize(
     "flow_file_path", obtain_flow_file_paths("flows", disabled_test_flows)
 )
-def test_argo_flows(pytestconfig, flow_file_path: str) -> None:
-    """Validate that all test flows can be successfully converted to Argo Workflow / WorkflowTemplate schema."""
+@pytest.mark.parametrize("output_format", ["argo-workflow", "argo-workflow-template"])
+def test_argo_flows(pytestconfig, flow_file_path: str, output_format: str) -> None:
+    """Validate that all test flows can be successfully converted to Argo Workflow / WorkflowTemplate schema.
+
+    Each (flow, output format) pair is its own test case so that pytest-xdist
+    (the -n flag the README recommends) distributes the interpreter-heavy
+    compile invocations across workers instead of running them serially.
+    """
 
     full_path: str = os.path.join("flows", flow_file_path)
     flow_base_name = os.path.splitext(os.path.basename(flow_file_path))[0]
 
-    output_formats = ["argo-workflow", "argo-workflow-template"]
-
-    for output_format in output_formats:
-        with TemporaryDirectory() as test_dir:
-            output_yaml_name = f"{flow_base_name}-{output_format}.yaml"
-            output_path = os.path.join(test_dir, output_yaml_name)
-
-            test_cmd: str = (
-                f"{_python()} {full_path} --datastore=s3 --with retry kfp run "
-                "--argo-wait --workflow-timeout 1800 "
-                "--max-parallelism 3 --experiment metaflow_test --tag test_t1 "
-                "--sys-tag test_sys_t1:sys_tag_value "
-                f"--yaml-only --yaml-format {output_format} "
-                f"--pipeline-path {output_path} "
-            )
-            if pytestconfig.getoption("image"):
-                test_cmd += f"--no-s3-code-package --base-image {pytestconfig.getoption('image')}"
-
-            assert (
-                subprocess_tee.run(
-                    test_cmd,
-                    universal_newlines=True,
-                    shell=True,
-                ).returncode
-                == 0
-            )
-
-            if output_format == "argo-workflow":
-                validation_cmd = f"argo lint {output_path}"
-            else:
-                validation_cmd = f"argo template lint {output_path}"
-
-            assert (
-                subprocess_tee.run(
-                    validation_cmd,
-                    universal_newlines=True,
-                    shell=True,
-                ).returncode
-                == 0
-            )
+    # everything but the format and output path is identical across
+    # formats; assemble the static prefix once
+    base_cmd: str = (
+        f"{_python()} {full_path} --datastore=s3 --with retry kfp run "
+        "--argo-wait --workflow-timeout 1800 "
+        "--max-parallelism 3 --experiment metaflow_test --tag test_t1 "
+        "--sys-tag test_sys_t1:sys_tag_value "
+        "--yaml-only "
+    )
+    if pytestconfig.getoption("image"):
+        base_cmd += (
+            f"--no-s3-code-package --base-image {pytestconfig.getoption('image')} "
+        )
+
+    with TemporaryDirectory() as test_dir:
+        output_yaml_name = f"{flow_base_name}-{output_format}.yaml"
+        output_path = os.path.join(test_dir, output_yaml_name)
+
+        test_cmd: str = (
+            f"{base_cmd}--yaml-format {output_format} "
+            f"--pipeline-path {output_path} "
+        )
+
+        assert (
+            subprocess_tee.run(
+                test_cmd,
+                universal_newlines=True,
+                shell=True,
+            ).returncode
+            == 0
+        )
+
+        if output_format == "argo-workflow":
+            validation_cmd = f"argo lint {output_path}"
+        else:
+            validation_cmd = f"argo template lint {output_path}"
+
+        assert (
+            subprocess_tee.run(
+                validation_cmd,
+                universal_newlines=True,
+                shell=True,
+            ).returncode
+            == 0
+        )
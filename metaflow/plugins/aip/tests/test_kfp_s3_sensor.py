@@ -1,5 +1,6 @@
 import base64
 import marshal
+import zlib
 import os
 import tempfile
 from unittest import mock
@@ -33,12 +34,12 @@ def identity_formatter(path: str, flow_parameters: dict) -> str:
 
 
 date_formatter_code_encoded = base64.b64encode(
-    marshal.dumps(data_formatter.__code__)
+    zlib.compress(marshal.dumps(data_formatter.__code__), 9)
 ).decode("ascii")
 
 
 identity_formatter_code_encoded = base64.b64encode(
-    marshal.dumps(identity_formatter.__code__)
+    zlib.compress(marshal.dumps(identity_formatter.__code__), 9)
 ).decode("ascii")
 
 
@@ -581,7 +581,8 @@ class StepFunctions(object):
         metadata_env = self.metadata.get_runtime_environment("step-functions")
         env.update(metadata_env)
 
-        metaflow_version = self.environment.get_environment_info()
+        # copy: get_environment_info() returns a shared cached dict
+        metaflow_version = dict(self.environment.get_environment_info())
         metaflow_version["flow_name"] = self.graph.name
         metaflow_version["production_token"] = self.production_token
         env["METAFLOW_VERSION"] = json.dumps(metaflow_version)